@@ -2,56 +2,210 @@ import asyncio
 import logging
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Awaitable, Callable, NamedTuple
 
-import onnxruntime
 from fastapi import (
     APIRouter,
+    Depends,
     FastAPI,
+    Header,
     HTTPException,
+    Query,
     Response,
 )
-
-from app.core.config import MODEL_PATH, PREDICT_INTERVAL
-from app.core.state import canvas_state
-from app.core.websocket import on_boardcast, on_predict_updated
-from app.models import BaseResponse, PredictionResponse, PredictionResult
+from fastapi.responses import JSONResponse
+
+from app.core.config import (
+    CANVAS_MAX_FPS,
+    CANVAS_MAX_MESSAGE_SIZE,
+    CANVAS_MEMORY_BUDGET,
+    FINAL_PREDICT_TIMEOUT,
+    LONG_POLL_TIMEOUT,
+    LOOP_MONITOR_ENABLED,
+    MODEL_DIR,
+    OUTBOUND_QUEUE_BUDGET,
+    PERSIST_STATE,
+    PREDICT_INTERVAL,
+)
+from app.core.history import prediction_history
+from app.core.loop_monitor import loop_monitor
+from app.core.model import model_registry
+from app.core.payloads import payload_store
+from app.core.persistence import (
+    notify_state_changed,
+    restore_snapshot,
+    save_snapshot,
+    set_aside_snapshot,
+    snapshot_task,
+)
+from app.core.recorder import session_recorder
+from app.core.state import BOOT_ID, StateVersion, canvas_state
+from app.core.websocket import (
+    ingress_stats,
+    memory_usage as outbound_memory_usage,
+    on_boardcast,
+    on_predict_updated,
+)
+from app.models import (
+    BaseResponse,
+    ModelSwapRequest,
+    PredictionResponse,
+    PredictionResult,
+)
 from app.utils.fix_job_time import fix_job_time
 from app.utils.image_processing import (
     format_results,
     postprocess_output,
     preprocess_image,
 )
-from app.utils.password import password_exists
+from app.utils.memory import get_peak_rss, get_rss, tracemalloc_diff
+from app.utils.password import check_password, password_exists
+from app.utils.startup_profile import get_startup_profile, mark
 import app.core.game_logic as game_logic
 
+if TYPE_CHECKING:
+    import numpy as np
+
 log = logging.getLogger("uvicorn")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global session, input_name
+    mark("lifespan_started")
 
     if not password_exists():
         log.warning('未设置密码！请在根目录创建 password.txt 并写入密码文本')
         log.warning('未设置密码将会拒绝所有需要密码验证的请求！')
 
-    # 加载模型
-    providers = (
-        ["CPUExecutionProvider", "CUDAExecutionProvider"]
-        if onnxruntime.get_device() == "GPU"
-        else ["CPUExecutionProvider"]
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start(asyncio.get_running_loop())
+
+    # 从快照恢复上次的进度（需在后台任务启动前完成）
+    if PERSIST_STATE:
+        try:
+            restore_snapshot()
+        except Exception as e:
+            # 快照有问题时不能阻止服务启动，以空状态启动
+            log.warning(f"从快照恢复失败，以空状态启动：{e!r}")
+            set_aside_snapshot()
+
+    tasks = [
+        asyncio.create_task(predict_timer()),
+        asyncio.create_task(game_logic.game_timer_task()),
+        asyncio.create_task(game_logic.command_actor_task()),
+        # 模型在后台加载，不阻塞静态页面和 WebSocket 的服务
+        asyncio.create_task(model_registry.load_in_background()),
+    ]
+    if PERSIST_STATE:
+        tasks.append(asyncio.create_task(snapshot_task()))
+
+    mark("serving")
+    yield
+
+    # 停止后台任务，并保存最后一次快照
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if PERSIST_STATE:
+        try:
+            await save_snapshot()
+        except Exception as e:
+            log.error(f"保存快照出现错误：{e}")
+    if session_recorder is not None:
+        session_recorder.close()
+    pool.shutdown(wait=False, cancel_futures=True)
+    priority_pool.shutdown(wait=False, cancel_futures=True)
+    loop_monitor.stop()
+
+
+router = APIRouter(lifespan=lifespan)
+
+
+async def require_password(x_password: str | None = Header(None)):
+    """需要密码验证的接口通过 `X-Password` 请求头提供密码"""
+    if not check_password(x_password):
+        raise HTTPException(status_code=401, detail="Invalid password")
+
+
+# region 健康检查
+
+
+@router.get(
+    "/health/live",
+    response_model=BaseResponse,
+    summary="存活检查",
+    description="进程能够处理请求即返回成功，不关心模型是否已加载",
+)
+async def health_live():
+    return BaseResponse()
+
+
+@router.get(
+    "/health/ready",
+    responses={503: dict(description="Model is still loading or failed to load")},
+    summary="就绪检查",
+    description="模型加载完成后返回 200，否则返回 503；同时返回模型状态和启动耗时",
+)
+async def health_ready():
+    ready = model_registry.ready.is_set()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "success": ready,
+            "model": model_registry.to_dict(),
+            "startup": get_startup_profile(),
+        },
     )
-    session = onnxruntime.InferenceSession(str(MODEL_PATH), providers=providers)
-    print(f"Model loaded: {MODEL_PATH}\nProviders: {session.get_providers()}")
-    input_name = session.get_inputs()[0].name
 
-    asyncio.create_task(predict_timer())
-    asyncio.create_task(game_logic.game_timer_task())
 
-    yield
+# endregion
 
 
-router = APIRouter(lifespan=lifespan)
+# region 条件请求与长轮询
+
+SINCE_DESCRIPTION = (
+    "上次得到的版本号（响应头 `X-State-Version`），"
+    f"版本号不变时最多等待 {LONG_POLL_TIMEOUT} 秒，仍无更新则返回 304"
+)
+
+
+def make_etag(kind: str, version: int) -> str:
+    return f'"{kind}-{BOOT_ID}-{version}"'
+
+
+async def conditional_get(
+    kind: str,
+    get_version: Callable[[], int],
+    wait_newer: Callable[[int, float], Awaitable[bool]],
+    response: Response,
+    since: int | None,
+    if_none_match: str | None,
+) -> Response | None:
+    """
+    处理 `?since=` 长轮询和 `If-None-Match` 条件请求
+
+    在 `response` 上设置 `ETag` 和 `X-State-Version` 响应头，
+    内容没有变化时返回 304 响应，否则返回 None
+    """
+    newer = True
+    if since is not None:
+        newer = await wait_newer(since, LONG_POLL_TIMEOUT)
+
+    version = get_version()
+    etag = make_etag(kind, version)
+    response.headers["ETag"] = etag
+    response.headers["X-State-Version"] = str(version)
+
+    if not newer or (
+        if_none_match is not None
+        and etag in [tag.strip() for tag in if_none_match.split(",")]
+    ):
+        return Response(status_code=304, headers=response.headers)
+    return None
+
+
+# endregion
 
 
 # region 更新图片
@@ -68,17 +222,34 @@ router = APIRouter(lifespan=lifespan)
                 "image/jpeg": {},
             },
         },
+        304: dict(description="Not modified since `If-None-Match` / `since`"),
         404: dict(description="No staged image ready yet"),
     },
     summary="获取当前暂存的图像",
-    description='推荐使用 `/ws/listener` 监听 `type: "image"` 避免反复轮询',
+    description='推荐使用 `/ws/listener` 监听 `type: "image"` 避免反复轮询；'
+    "无法使用 WebSocket 时可使用 `If-None-Match` 或 `?since=` 长轮询",
 )
-async def get_image():
+async def get_image(
+    response: Response,
+    since: int | None = Query(None, description=SINCE_DESCRIPTION),
+    if_none_match: str | None = Header(None),
+):
+    not_modified = await conditional_get(
+        "image",
+        canvas_state.get_version,
+        canvas_state.wait_newer,
+        response,
+        since,
+        if_none_match,
+    )
+    if not_modified is not None:
+        return not_modified
+
     image_bytes = canvas_state.get_latest_canvas_bytes()
     image_type = canvas_state.get_latest_canvas_type()
     if image_bytes is None:
         raise HTTPException(status_code=404, detail="No staged image ready yet")
-    return Response(content=image_bytes, media_type=image_type)
+    return Response(content=image_bytes, media_type=image_type, headers=response.headers)
 
 
 # endregion
@@ -88,50 +259,216 @@ async def get_image():
 
 event_image_updated = asyncio.Event()
 staged_top5: list[PredictionResult] | None = None
+# staged_top5 对应的画布版本号
+staged_version: int = 0
+# 推理结果的版本号，每次暂存新结果时递增
+prediction_version = StateVersion()
+
+# 正在进行的定时推理任务，优先推理开始时会将其取消
+periodic_job: asyncio.Task | None = None
+# 定时推理任务是否被优先通道取消（用于区分 predict_timer 自身被取消）
+periodic_job_superseded: bool = False
+
+# 最终推理任务（优先通道）及其对应的画布版本号
+final_job: asyncio.Task | None = None
+final_job_version: int = -1
 
 
 async def predict_timer():
+    global periodic_job, periodic_job_superseded
+
     while True:
         await event_image_updated.wait()
+        # 模型加载完成前暂缓推理
+        await model_registry.ready.wait()
         event_image_updated.clear()
         async with fix_job_time(PREDICT_INTERVAL):
+            periodic_job_superseded = False
+            periodic_job = asyncio.create_task(do_predict_for_staged_image())
             try:
-                await do_predict_for_staged_image()
+                await periodic_job
+            except asyncio.CancelledError:
+                # 区分“自身被取消”和“推理任务被优先通道取消”
+                if not periodic_job_superseded:
+                    raise
+                log.info("定时推理已被最终推理取代")
             except Exception as e:
                 log.error(f"定时推理任务出现错误：{e}")
+            finally:
+                periodic_job = None
 
 
 async def do_predict_for_staged_image():
-    global staged_top5
-
     current_image_bytes = canvas_state.get_latest_canvas_bytes()
-    assert current_image_bytes is not None
+    if current_image_bytes is None:
+        # 画布已被清空，清空时已经发布了空结果
+        return
+    version = canvas_state.get_version()
+
+    output = await run_inference(current_image_bytes)
+    publish_prediction(
+        output.results, version, output.probabilities, output.class_names
+    )
+
+
+def publish_prediction(
+    results: list[PredictionResult],
+    version: int,
+    probabilities: "np.ndarray | None" = None,
+    class_names: list[str] | None = None,
+) -> bool:
+    """
+    暂存推理结果并广播，比已暂存结果更旧的结果会被丢弃
+
+    带有完整概率向量的结果会记入本轮的推理历史，对外展示平滑后的 Top-5
 
-    model_output = await run_inference(current_image_bytes)
-    staged_top5 = postprocess_output(model_output, top_k=5)
+    Returns:
+        bool: 结果是否被采用
+    """
+    global staged_top5, staged_version
+
+    if version < staged_version:
+        log.info(f"丢弃过期的推理结果 (v{version} < v{staged_version})")
+        return False
+
+    staged_top5 = results
+    staged_version = version
+    prediction_version.bump()
+    notify_state_changed()
 
-    log.info(f"当前推理结果：{format_results(staged_top5)}")
+    log.info(f"当前推理结果 (v{version})：{format_results(staged_top5)}")
 
-    asyncio.create_task(on_predict_updated(staged_top5))
+    display = results
+    if probabilities is not None:
+        prediction_history.record(probabilities, class_names)
+        display = prediction_history.smoothed_top_k(5)
+    round_stats = prediction_history.stats(game_logic.game_state.target_label)
+
+    payloads = payload_store.set_predictions(
+        staged_top5, version, display=display, round_stats=round_stats
+    )
+    on_predict_updated(payloads)
+    return True
 
 
 pool = ThreadPoolExecutor(max_workers=4)
+# 优先通道独占的线程，保证最终推理不会排在定时推理之后
+priority_pool = ThreadPoolExecutor(max_workers=1)
 
 
-async def run_inference(image_bytes: bytes):
+class InferenceOutput(NamedTuple):
+    results: list[PredictionResult]
+    # 完整的概率向量及对应的类别名称，空白画布时为 None
+    probabilities: "np.ndarray | None" = None
+    class_names: list[str] | None = None
+
+
+async def run_inference(
+    image_bytes: bytes, executor: ThreadPoolExecutor = pool, top_k: int = 5
+) -> InferenceOutput:
+    if not model_registry.ready.is_set():
+        raise HTTPException(status_code=503, detail="Model not ready yet")
     try:
         loop = asyncio.get_event_loop()
-        input_tensor = await loop.run_in_executor(pool, preprocess_image, image_bytes)
-
-        model_output = await loop.run_in_executor(
-            pool, session.run, None, {input_name: input_tensor}
+        input_tensor = await loop.run_in_executor(
+            executor, preprocess_image, image_bytes
         )
-        return model_output[0]
+        if input_tensor is None:
+            # 空白画布，跳过推理，结果为空
+            return InferenceOutput([])
+
+        # 推理期间发生模型替换时，本次推理仍使用旧模型完成
+        with model_registry.use() as model:
+            model_output = await loop.run_in_executor(
+                executor, model.session.run, None, {model.input_name: input_tensor}
+            )
+            results = postprocess_output(
+                model_output[0], top_k=top_k, class_names=model.class_names
+            )
+            return InferenceOutput(results, model_output[0][0], model.class_names)
     except Exception as e:
         # print(f"An error occurred during inference: {e}")
         raise HTTPException(status_code=500, detail=f"Inference error: {e}")
 
 
+async def do_final_predict(
+    image_bytes: bytes, version: int
+) -> tuple[list[PredictionResult], int]:
+    output = await run_inference(image_bytes, priority_pool)
+    publish_prediction(
+        output.results, version, output.probabilities, output.class_names
+    )
+    return output.results, version
+
+
+def log_final_job_error(job: asyncio.Task):
+    """取出最终推理任务的异常，没有人等待的任务（如计时结束时发起的）出错时也能记录"""
+    if not job.cancelled() and job.exception() is not None:
+        log.warning(f"最终推理失败：{job.exception()!r}")
+
+
+def request_final_prediction() -> asyncio.Task | None:
+    """
+    为最新的画布版本发起最终推理（优先通道）
+
+    已经暂存了该版本的结果、或该版本的最终推理已在进行（或已成功完成）时不会重复推理；
+    之前失败的最终推理（如当时模型尚未加载完成）会重新发起。
+    进行中的定时推理会被取消，其结果不再采用。
+    """
+    global final_job, final_job_version, periodic_job_superseded
+
+    version = canvas_state.get_version()
+    image_bytes = canvas_state.get_latest_canvas_bytes()
+    if image_bytes is None or (staged_top5 is not None and version == staged_version):
+        return None
+
+    if (
+        final_job is not None
+        and final_job_version == version
+        and (
+            not final_job.done()
+            or (not final_job.cancelled() and final_job.exception() is None)
+        )
+    ):
+        return final_job
+
+    if final_job is not None and not final_job.done():
+        final_job.cancel()
+    if periodic_job is not None and not periodic_job.done():
+        periodic_job_superseded = True
+        periodic_job.cancel()
+
+    final_job = asyncio.create_task(do_final_predict(image_bytes, version))
+    final_job.add_done_callback(log_final_job_error)
+    final_job_version = version
+    return final_job
+
+
+async def get_final_prediction() -> tuple[list[PredictionResult], int]:
+    """
+    得到最新画布版本的最终推理结果及其版本号
+
+    最多等待 `FINAL_PREDICT_TIMEOUT` 秒，超时或出错时退回到已暂存的结果
+    """
+    job = request_final_prediction()
+    if job is not None:
+        try:
+            # shield: 超时后推理继续进行，结果仍会被暂存并广播
+            return await asyncio.wait_for(asyncio.shield(job), FINAL_PREDICT_TIMEOUT)
+        except asyncio.CancelledError:
+            # 等待期间画布又有更新，该任务被更新的最终推理取代；
+            # 有 shield 保护，若是调用方自身被取消，推理任务本身不会被取消
+            if not job.cancelled():
+                raise
+            log.warning("最终推理已被取代，使用已暂存的结果")
+        except asyncio.TimeoutError:
+            log.warning(f"最终推理超过 {FINAL_PREDICT_TIMEOUT} 秒，使用已暂存的结果")
+        except Exception as e:
+            log.error(f"最终推理出现错误：{e}，使用已暂存的结果")
+
+    return staged_top5 or [], staged_version
+
+
 # endregion
 
 
@@ -141,33 +478,83 @@ async def run_inference(image_bytes: bytes):
 @router.get(
     "/top1",
     response_model=PredictionResponse,
-    responses={404: dict(description="No staged result ready yet")},
+    responses={
+        304: dict(description="Not modified since `If-None-Match` / `since`"),
+        404: dict(description="No staged result ready yet"),
+    },
     summary="得到 Top-1 的结果",
-    description='推荐使用 `/ws/listener` 监听 `type: "top5"` 避免反复轮询',
+    description='推荐使用 `/ws/listener` 监听 `type: "top5"` 避免反复轮询；'
+    "无法使用 WebSocket 时可使用 `If-None-Match` 或 `?since=` 长轮询",
 )
-async def predict_top1():
+async def predict_top1(
+    response: Response,
+    since: int | None = Query(None, description=SINCE_DESCRIPTION),
+    if_none_match: str | None = Header(None),
+):
     """
     返回当前置信度最高的结果。
     """
-    if staged_top5 is None:
+    not_modified = await conditional_get(
+        "predictions",
+        lambda: prediction_version.value,
+        prediction_version.wait_newer,
+        response,
+        since,
+        if_none_match,
+    )
+    if not_modified is not None:
+        return not_modified
+
+    predictions = payload_store.predictions
+    if predictions is None:
         raise HTTPException(status_code=404, detail="No staged result ready yet")
-    return PredictionResponse(results=staged_top5[:1])
+    # 直接返回已编码的响应，避免每次请求重新构造和序列化
+    return Response(
+        content=predictions.top1_response.body,
+        media_type="application/json",
+        headers=response.headers,
+    )
 
 
 @router.get(
     "/top5",
     response_model=PredictionResponse,
-    responses={404: dict(description="No staged result ready yet")},
+    responses={
+        304: dict(description="Not modified since `If-None-Match` / `since`"),
+        404: dict(description="No staged result ready yet"),
+    },
     summary="得到 Top-5 的结果",
-    description='推荐使用 `/ws/listener` 监听 `type: "top5"` 避免反复轮询',
+    description='推荐使用 `/ws/listener` 监听 `type: "top5"` 避免反复轮询；'
+    "无法使用 WebSocket 时可使用 `If-None-Match` 或 `?since=` 长轮询",
 )
-async def predict_top5():
+async def predict_top5(
+    response: Response,
+    since: int | None = Query(None, description=SINCE_DESCRIPTION),
+    if_none_match: str | None = Header(None),
+):
     """
     返回当前置信度前5名的结果。
     """
-    if staged_top5 is None:
+    not_modified = await conditional_get(
+        "predictions",
+        lambda: prediction_version.value,
+        prediction_version.wait_newer,
+        response,
+        since,
+        if_none_match,
+    )
+    if not_modified is not None:
+        return not_modified
+
+    predictions = payload_store.predictions
+    if predictions is None:
         raise HTTPException(status_code=404, detail="No staged result ready yet")
-    return PredictionResponse(results=staged_top5)
+    # 直接返回已编码的响应，避免每次请求重新构造和序列化
+    return Response(
+        content=predictions.top5_response.body,
+        media_type="application/json",
+        headers=response.headers,
+    )
 
 
 # endregion
@@ -240,8 +627,192 @@ async def boardcast(params: dict):
     """
     if "type" not in params:
         raise HTTPException(status_code=400, detail="Missing required field: 'type'")
-    asyncio.create_task(on_boardcast(params))
+    await on_boardcast(params)
     return BaseResponse()
 
 
 # endregion
+
+
+# region 画布帧入口统计
+
+
+@router.get(
+    "/admin/ingress",
+    dependencies=[Depends(require_password)],
+    responses={401: dict(description="Invalid password")},
+    summary="查看画布帧入口统计",
+    description="被接受、被合并（丢弃旧帧）和被拒绝的画布帧数量。"
+    "需要在 `X-Password` 请求头中提供密码",
+)
+async def get_ingress_stats():
+    return {
+        "success": True,
+        "limits": {
+            "max_message_size": CANVAS_MAX_MESSAGE_SIZE,
+            "max_fps": CANVAS_MAX_FPS,
+        },
+        "stats": {
+            key: ingress_stats[key]
+            for key in ("accepted", "coalesced", "rejected_size", "rejected_invalid")
+        },
+    }
+
+
+# endregion
+
+
+# region 内存
+
+
+@router.get(
+    "/debug/memory",
+    dependencies=[Depends(require_password)],
+    responses={401: dict(description="Invalid password")},
+    summary="查看内存占用",
+    description="进程的 RSS、各部分缓存的大小和内存预算。"
+    "开启 tracemalloc 后还会返回与上一次查询相比增长最多的分配位置。"
+    "需要在 `X-Password` 请求头中提供密码",
+)
+async def get_memory(
+    top: int = Query(10, ge=1, le=100, description="返回的分配位置数量"),
+):
+    tracemalloc_top = None
+    if tracemalloc_diff.is_tracing():
+        loop = asyncio.get_running_loop()
+        tracemalloc_top = await loop.run_in_executor(
+            None, tracemalloc_diff.top_diff, top
+        )
+
+    return {
+        "success": True,
+        "rss": get_rss(),
+        "peak_rss": get_peak_rss(),
+        "budgets": {
+            "canvas": CANVAS_MEMORY_BUDGET,
+            "outbound_queue": OUTBOUND_QUEUE_BUDGET,
+        },
+        "subsystems": {
+            **payload_store.memory_usage(),
+            "outbound": outbound_memory_usage(),
+            "prediction_history": prediction_history.memory_usage(),
+        },
+        "tracemalloc": {
+            "tracing": tracemalloc_diff.is_tracing(),
+            "top": tracemalloc_top,
+        },
+    }
+
+
+@router.post(
+    "/debug/memory/tracemalloc",
+    dependencies=[Depends(require_password)],
+    responses={401: dict(description="Invalid password")},
+    summary="开启或关闭 tracemalloc",
+    description="开启后所有内存分配都会变慢，排查完应及时关闭。"
+    "需要在 `X-Password` 请求头中提供密码",
+)
+async def set_tracemalloc(
+    enable: bool = Query(..., description="开启或关闭"),
+    frames: int = Query(1, ge=1, le=50, description="每次分配记录的调用栈深度"),
+):
+    if enable:
+        tracemalloc_diff.start(frames)
+    else:
+        tracemalloc_diff.stop()
+    return {"success": True, "tracing": tracemalloc_diff.is_tracing()}
+
+
+# endregion
+
+
+# region 事件循环健康
+
+
+@router.get(
+    "/debug/loop",
+    dependencies=[Depends(require_password)],
+    responses={401: dict(description="Invalid password")},
+    summary="查看事件循环的调度延迟和阻塞位置",
+    description="调度延迟的分布，以及阻塞事件循环超过阈值的调用位置"
+    "（按累计阻塞时长排序，附带最严重一次的调用栈）和最近的阻塞事件。"
+    "需要在 `X-Password` 请求头中提供密码",
+)
+async def get_loop_health(
+    top: int = Query(10, ge=1, le=100, description="返回的调用位置数量"),
+):
+    return {"success": True, **loop_monitor.to_dict(top)}
+
+
+@router.post(
+    "/debug/loop/reset",
+    dependencies=[Depends(require_password)],
+    responses={401: dict(description="Invalid password")},
+    summary="清空事件循环的统计数据",
+    description="需要在 `X-Password` 请求头中提供密码",
+)
+async def reset_loop_health():
+    loop_monitor.reset()
+    return BaseResponse()
+
+
+# endregion
+
+
+# region 模型管理
+
+
+def resolve_model_file(name: str) -> Path:
+    """将相对于 models 目录的路径解析为绝对路径，不允许访问目录以外的文件"""
+    path = (MODEL_DIR / name).resolve()
+    if not path.is_relative_to(MODEL_DIR.resolve()) or not path.is_file():
+        raise HTTPException(status_code=404, detail=f"File not found: {name}")
+    return path
+
+
+@router.get(
+    "/admin/model",
+    dependencies=[Depends(require_password)],
+    responses={401: dict(description="Invalid password")},
+    summary="查看当前模型",
+    description="需要在 `X-Password` 请求头中提供密码",
+)
+async def get_model_info():
+    return {"success": True, "model": model_registry.to_dict()}
+
+
+@router.post(
+    "/admin/model/swap",
+    dependencies=[Depends(require_password)],
+    responses={
+        401: dict(description="Invalid password"),
+        404: dict(description="Model or class names file not found"),
+        409: dict(description="Another swap is in progress"),
+        503: dict(description="Initial model still loading"),
+        422: dict(description="Model failed to load or validate"),
+    },
+    summary="替换模型",
+    description="在后台加载、校验并预热新模型，完成后替换当前模型，进行中的推理不受影响。"
+    "需要在 `X-Password` 请求头中提供密码",
+)
+async def swap_model(request: ModelSwapRequest):
+    if model_registry.status == "loading":
+        raise HTTPException(status_code=503, detail="Initial model still loading")
+    if model_registry.is_swapping():
+        raise HTTPException(status_code=409, detail="Another swap is in progress")
+
+    path = resolve_model_file(request.path)
+    class_names_path = resolve_model_file(request.class_names_path)
+    try:
+        await model_registry.swap(path, class_names_path)
+    except Exception as e:
+        log.error(f"模型替换失败：{e}")
+        raise HTTPException(status_code=422, detail=f"Model swap failed: {e}")
+
+    # 用新模型重新推理当前画布
+    if canvas_state.get_latest_canvas_bytes() is not None:
+        event_image_updated.set()
+    return {"success": True, "model": model_registry.to_dict()}
+
+
+# endregion
@@ -19,3 +19,35 @@ CPU_WORKER_COUNT = max(1, os.cpu_count() // 2)
 # 其它配置
 PREDICT_INTERVAL = 1  # 预测间隔，单位秒
 TIMER_MAX_VALUE = 90  # 计时器最大值，单位秒
+FINAL_PREDICT_TIMEOUT = 3  # 揭晓结果时等待最终推理的最长时间，单位秒
+LONG_POLL_TIMEOUT = 25  # REST 长轮询（?since=）的最长等待时间，单位秒
+
+# 画布帧入口限制（每个 WebSocket 连接）
+CANVAS_MAX_MESSAGE_SIZE = 2 * 1024 * 1024  # 单条消息最大长度，单位字符
+CANVAS_MAX_FPS = 5  # 每秒最多处理的画布帧数，处理不过来时只保留最新一帧
+
+# 状态快照，用于进程重启后恢复游戏进度
+SNAPSHOT_PATH = BASE_DIR / "snapshot" / "state.snapshot"
+SNAPSHOT_INTERVAL = 5  # 无状态变化时的快照间隔，单位秒
+SNAPSHOT_MIN_INTERVAL = 1  # 两次快照之间的最小间隔，单位秒
+# 默认开启，启动时设置环境变量 PERSIST_STATE=0 关闭（不读取也不写入快照）
+PERSIST_STATE = os.environ.get("PERSIST_STATE") != "0"
+
+# 录制画布帧和管理员命令，用于回放测试（scripts/replay_session.py）
+# 默认关闭，启动时设置环境变量 RECORD_SESSIONS=1 开启
+RECORD_SESSIONS = os.environ.get("RECORD_SESSIONS") == "1"
+RECORD_DIR = BASE_DIR / "recordings"
+
+# 推理历史（每轮），用于平滑展示结果和统计本轮表现
+HISTORY_CAPACITY = 512  # 每轮最多保留的推理结果数，超出后覆盖最旧的
+SMOOTHING_ALPHA = 0.5  # 指数移动平均的系数，越大越偏向最新结果
+SMOOTHING_WINDOW = 8  # 参与平滑的最近推理结果数
+
+# 内存预算，单位字节，超出时先丢弃最旧的数据
+CANVAS_MEMORY_BUDGET = 32 * 1024 * 1024  # 画布、图片消息和新连接同步消息的缓存
+OUTBOUND_QUEUE_BUDGET = 8 * 1024 * 1024  # 每个 WebSocket 连接待发送的消息，超出时丢弃被取代的旧消息
+
+# 事件循环健康监控，默认开启，启动时设置环境变量 LOOP_MONITOR=0 关闭
+LOOP_MONITOR_ENABLED = os.environ.get("LOOP_MONITOR") != "0"
+LOOP_MONITOR_INTERVAL = 0.02  # 测量调度延迟的间隔，单位秒
+SLOW_CALLBACK_THRESHOLD = 0.05  # 调度延迟超过该值时记录阻塞处的调用栈，单位秒
@@ -1,9 +1,11 @@
 # app/core/game_logic.py
 import asyncio
 import logging
+from typing import Awaitable, Callable
 
 from app.utils.fix_job_time import fix_job_time
 from app.core.config import TIMER_MAX_VALUE
+from app.core.history import prediction_history
 
 
 log = logging.getLogger("uvicorn")
@@ -63,6 +65,15 @@ class GameState:
             self.target_label = data["label"]
             self.target_name = data["name"]
 
+    def restore(self, state: dict):
+        """从 `to_dict` 的结果恢复状态"""
+        self.round_num = state["round"]
+        self.try_num = state["try_num"]
+        self.phase = state["phase"]
+        self.target_label = state["target_label"]
+        self.target_name = state["target_name"]
+        self.current_timer_value = state["timer_value"]
+
     def to_dict(self):
         """返回可序列化为 JSON 的状态"""
         return {
@@ -83,25 +94,38 @@ game_state = GameState()
 reset_event = asyncio.Event()
 start_event = asyncio.Event()
 
+# 命令队列，所有游戏状态的变更都由 `command_actor_task` 逐条串行执行
+command_queue: asyncio.Queue[tuple[Callable[[], Awaitable], asyncio.Future]] = (
+    asyncio.Queue()
+)
+
 
 async def broadcast_game_state():
     """广播当前游戏状态给所有客户端"""
-    from app.core.websocket import on_boardcast
+    from app.core.payloads import payload_store
+    from app.core.persistence import notify_state_changed
+    from app.core.websocket import broadcast_payload
 
-    log.info(f"广播状态: {game_state.to_dict()}")
-    await on_boardcast({"type": "game_state_update", "payload": game_state.to_dict()})
+    notify_state_changed()
+    state = game_state.to_dict()
+    log.info(f"广播状态: {state}")
+    await broadcast_payload(payload_store.game_state(state))
 
 
 async def clear_canvas_and_broadcast():
     """清空画布并广播"""
+    from app.core.api import publish_prediction
     from app.core.state import canvas_state
     from app.core.websocket import on_image_updated
 
-    # 1. 清空服务器状态
-    # (我们用一个空的 data url 来表示清空)
-    canvas_state.set_latest_canvas("data:,")
+    # 1. 清空服务器状态和本轮的推理历史
+    canvas_state.clear()
+    prediction_history.reset()
 
-    # 2. 广播空图片
+    # 2. 空画布不需要推理，直接发布空结果
+    publish_prediction([], canvas_state.get_version())
+
+    # 3. 广播空图片
     # (show.js 的 updateImage 逻辑会处理这个空 base64 并显示占位符)
     await on_image_updated(b"", "image/png")
 
@@ -121,7 +145,8 @@ async def game_timer_task():
             start_event.clear()  # 清除误触发的事件
             continue
 
-        for remaining in range(TIMER_MAX_VALUE, -1, -1):
+        # 通常从 TIMER_MAX_VALUE 开始，从快照恢复时从剩余时间继续
+        for remaining in range(game_state.current_timer_value, -1, -1):
             game_state.current_timer_value = remaining
             async with fix_job_time(1):
                 if reset_event.is_set():
@@ -131,8 +156,8 @@ async def game_timer_task():
                 )
         else:
             log.info("计时器自然结束")
-            game_state.set_phase("REVEAL_WAITING")  # 切换到“等待揭晓”
-            await broadcast_game_state()
+            # 与管理员命令一样经过命令队列，等待状态变更完成
+            await submit_job(expire_timer)
             # 计时器结束后，重置 game_state 值
             reset_event.set()  # (确保 wait() 不会卡住)
             game_state.current_timer_value = TIMER_MAX_VALUE
@@ -141,6 +166,54 @@ async def game_timer_task():
         game_state.current_timer_value = TIMER_MAX_VALUE
 
 
+async def expire_timer():
+    """计时器自然结束：进入等待揭晓，并立即对最后一帧发起最终推理"""
+    from app.core.api import request_final_prediction
+
+    if game_state.phase != "DRAWING":
+        # 计时结束前已被管理员重置
+        log.warning(f"计时器结束时处于 {game_state.phase} 阶段，已忽略")
+        return
+
+    game_state.set_phase("REVEAL_WAITING")  # 切换到“等待揭晓”
+    prediction_history.finish()  # 本轮的时长统计截止到此时
+    # 揭晓时直接使用最终推理的结果
+    request_final_prediction()
+    await broadcast_game_state()
+
+
+def submit_job(job: Callable[[], Awaitable]) -> asyncio.Future:
+    """把状态变更交给命令队列，返回执行完成时完成的 Future"""
+    future = asyncio.get_running_loop().create_future()
+    command_queue.put_nowait((job, future))
+    return future
+
+
+def submit_command(command: dict) -> asyncio.Future:
+    """把客户端发来的命令交给命令队列"""
+    return submit_job(lambda: dispatch(command))
+
+
+async def command_actor_task():
+    """
+    命令队列的唯一消费者
+
+    命令逐条执行，状态变更不会交错；一条命令引起的所有消息合并为一条广播
+    """
+    from app.core.websocket import batched_broadcast
+
+    while True:
+        job, future = await command_queue.get()
+        try:
+            async with batched_broadcast():
+                await job()
+        except Exception as e:
+            log.error(f"执行命令出现错误：{e}")
+        finally:
+            if not future.done():
+                future.set_result(None)
+
+
 async def dispatch(command: dict):
     """
     处理来自客户端的 'command' 类型消息
@@ -174,6 +247,7 @@ async def dispatch(command: dict):
         if game_state.phase == "WAITING":
             log.info("处理命令: START_TIMER")
             game_state.set_phase("DRAWING")  # 切换到“绘画中”
+            prediction_history.reset()  # 统计的时间从开始绘画算起
 
             start_event.set()
             reset_event.clear()
@@ -226,16 +300,33 @@ async def dispatch(command: dict):
             log.info("处理命令: REVEAL_RESULTS")
 
             # --- 使用函数内导入来安全地获取 api.py 的数据 ---
-            from app.core.api import staged_top5 as api_staged_top5
+            from app.core.api import get_final_prediction
+            from app.core.payloads import payload_store
+
+            # 等待最新画布版本的最终推理结果（有超时上限）
+            final_results, canvas_version = await get_final_prediction()
 
-            final_results_list = []
-            if api_staged_top5:
+            # 最终结果通常就是刚暂存的结果，直接复用已转换好的列表
+            predictions = payload_store.predictions
+            if predictions is not None and predictions.version == canvas_version:
+                final_results_list = predictions.results
+            else:
                 final_results_list = [
-                    {"label": r.label, "score": r.score} for r in api_staged_top5
+                    {"label": r.label, "score": r.score} for r in final_results
                 ]
 
             await on_boardcast(
-                {"type": "final_results", "payload": {"results": final_results_list}}
+                {
+                    "type": "final_results",
+                    "payload": {
+                        "results": final_results_list,
+                        "canvas_version": canvas_version,
+                        # 由本轮推理历史计算，不需要额外推理
+                        "round_stats": prediction_history.stats(
+                            game_state.target_label
+                        ),
+                    },
+                }
             )
         else:
             log.warning(f"在 {game_state.phase} 阶段收到 REVEAL_RESULTS，已忽略")
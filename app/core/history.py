@@ -0,0 +1,125 @@
+# app/core/history.py
+import time
+from typing import TYPE_CHECKING
+
+from app.core.config import HISTORY_CAPACITY, SMOOTHING_ALPHA, SMOOTHING_WINDOW
+from app.models import PredictionResult
+
+# numpy 导入较慢，推迟到第一次记录时再导入
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class PredictionHistory:
+    """
+    本轮的推理历史
+
+    完整的概率向量和时间戳保存在预先分配的环形缓冲区中，
+    用于平滑展示结果和统计“多久猜中”“目标保持第一的时长”，不需要额外推理
+    """
+
+    def __init__(self, capacity: int = HISTORY_CAPACITY):
+        self.capacity = capacity
+        self.class_names: list[str] = []
+        self._probs: "np.ndarray | None" = None  # (capacity, num_classes)
+        self._times: "np.ndarray | None" = None  # (capacity,) 距本轮开始的秒数
+        self._count: int = 0  # 本轮记录的总数（可能超过容量）
+        self._started_at: float = time.monotonic()
+        self._finished_at: float | None = None
+
+    def reset(self):
+        """开始新的一轮（或重新开始计时），只重置计数，不重新分配内存"""
+        self._count = 0
+        self._started_at = time.monotonic()
+        self._finished_at = None
+
+    def finish(self):
+        """本轮计时结束，之后的时长统计截止到此时"""
+        self._finished_at = time.monotonic()
+
+    def record(self, probabilities: "np.ndarray", class_names: list[str]):
+        import numpy as np
+
+        probabilities = np.asarray(probabilities, dtype=np.float32).reshape(-1)
+        if self._probs is None or self._probs.shape[1] != probabilities.shape[0]:
+            # 第一次记录或模型类别数变化（模型被替换）时分配缓冲区
+            self._probs = np.zeros(
+                (self.capacity, probabilities.shape[0]), dtype=np.float32
+            )
+            self._times = np.zeros(self.capacity, dtype=np.float64)
+            self._count = 0
+        elif class_names != self.class_names:
+            # 替换后的模型类别数相同但类别顺序不同，旧记录无法与新记录对应
+            self._count = 0
+        self.class_names = class_names
+
+        index = self._count % self.capacity
+        self._probs[index] = probabilities
+        self._times[index] = time.monotonic() - self._started_at
+        self._count += 1
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def memory_usage(self) -> int:
+        """缓冲区大小，单位字节"""
+        if self._probs is None:
+            return 0
+        return self._probs.nbytes + self._times.nbytes
+
+    def _indices(self, n: int) -> "np.ndarray":
+        """最近 n 条记录在缓冲区中的下标，按时间先后排列"""
+        import numpy as np
+
+        return (np.arange(self._count - n, self._count)) % self.capacity
+
+    def smoothed_top_k(self, top_k: int = 5) -> list[PredictionResult]:
+        """对最近 `SMOOTHING_WINDOW` 条记录做指数移动平均后的 Top-K"""
+        import numpy as np
+
+        n = min(len(self), SMOOTHING_WINDOW)
+        if n == 0:
+            return []
+
+        # 越新的记录权重越大：alpha * (1 - alpha)^(距最新记录的条数)
+        weights = SMOOTHING_ALPHA * (1 - SMOOTHING_ALPHA) ** np.arange(n - 1, -1, -1)
+        smoothed = (weights / weights.sum()) @ self._probs[self._indices(n)]
+
+        top_k_indices = np.argsort(smoothed)[::-1][:top_k]
+        return [
+            PredictionResult(label=self.class_names[i], score=float(smoothed[i]))
+            for i in top_k_indices
+        ]
+
+    def stats(self, target_label: str | None) -> dict:
+        """本轮统计：首次猜中的时间、目标保持第一的总时长、目标的最高置信度"""
+        import numpy as np
+
+        n = len(self)
+        stats = {
+            "samples": n,
+            "time_to_first_correct": None,
+            "time_target_top1": 0.0,
+            "target_peak_score": None,
+        }
+        if n == 0 or target_label not in self.class_names:
+            return stats
+
+        indices = self._indices(n)
+        probs = self._probs[indices]
+        times = self._times[indices]
+        target = self.class_names.index(target_label)
+
+        correct = probs.argmax(axis=1) == target
+        # 每条记录的结果持续到下一条记录（最后一条持续到本轮结束或当前时间）
+        end = (self._finished_at or time.monotonic()) - self._started_at
+        durations = np.maximum(np.diff(times, append=max(end, times[-1])), 0)
+
+        if correct.any():
+            stats["time_to_first_correct"] = round(float(times[correct.argmax()]), 3)
+        stats["time_target_top1"] = round(float(durations[correct].sum()), 3)
+        stats["target_peak_score"] = float(probs[:, target].max())
+        return stats
+
+
+prediction_history = PredictionHistory()
@@ -0,0 +1,201 @@
+# app/core/loop_monitor.py
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from pathlib import Path
+
+from app.core.config import (
+    BASE_DIR,
+    LOOP_MONITOR_INTERVAL,
+    SLOW_CALLBACK_THRESHOLD,
+)
+
+LAG_WINDOW = 500  # 统计调度延迟时保留的最近样本数
+RECENT_SLOW_EVENTS = 20  # 保留的最近阻塞事件数
+STACK_DEPTH = 15  # 每个阻塞事件保留的调用栈深度
+
+# 只有这些目录下的代码算作项目代码，项目根目录下的虚拟环境等不算
+PROJECT_CODE_DIRS = (BASE_DIR / "app", BASE_DIR / "scripts")
+
+
+def is_project_code(path: Path) -> bool:
+    return (
+        any(path.is_relative_to(directory) for directory in PROJECT_CODE_DIRS)
+        and "site-packages" not in path.parts
+        and path.name != "loop_monitor.py"
+    )
+
+
+def find_call_site(stack: traceback.StackSummary) -> str:
+    """调用栈中最内层的项目代码位置，找不到时使用最内层的帧"""
+    for frame in reversed(stack):
+        path = Path(frame.filename)
+        if is_project_code(path):
+            path = path.relative_to(BASE_DIR).as_posix()
+            return f"{path}:{frame.lineno} ({frame.name})"
+    frame = stack[-1]
+    return f"{frame.filename}:{frame.lineno} ({frame.name})"
+
+
+class LoopMonitor:
+    """
+    事件循环健康监控
+
+    后台线程每隔 `LOOP_MONITOR_INTERVAL` 秒向事件循环投递一个回调，
+    测量它被执行前的等待时间（调度延迟）。等待超过 `SLOW_CALLBACK_THRESHOLD` 秒
+    说明有回调或任务步骤阻塞了事件循环，此时从后台线程抓取事件循环线程的调用栈，
+    并按调用位置累计阻塞的次数和时长。
+
+    长于“阈值 + 间隔”的阻塞一定会被记录，较短的阻塞按采样记录
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_MONITOR_INTERVAL,
+        threshold: float = SLOW_CALLBACK_THRESHOLD,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空统计数据"""
+        with self._lock:
+            self._lags: deque[float] = deque(maxlen=LAG_WINDOW)
+            self.samples: int = 0
+            self.max_lag: float = 0.0
+            self.slow_count: int = 0
+            self.recent: deque[dict] = deque(maxlen=RECENT_SLOW_EVENTS)
+            # 调用位置 -> {count, total, max, stack}
+            self.sites: dict[str, dict] = {}
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """开始监控，应在事件循环所在的线程中调用"""
+        if self._thread is not None:
+            return
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="loop-monitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    def _run(self):
+        while not self._stop.is_set():
+            executed = threading.Event()
+            executed_at: list[float] = []
+
+            def beat():
+                executed_at.append(time.perf_counter())
+                executed.set()
+
+            sent_at = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(beat)
+            except RuntimeError:
+                # 事件循环已关闭
+                return
+
+            stack = None
+            if not executed.wait(self.threshold):
+                # 事件循环被阻塞，抓取此刻事件循环线程正在执行的代码
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    stack = traceback.extract_stack(frame)[-STACK_DEPTH:]
+                while not executed.wait(0.5):
+                    if self._stop.is_set():
+                        return
+
+            self._record(executed_at[0] - sent_at, stack)
+            self._stop.wait(self.interval)
+
+    def _record(self, lag: float, stack: traceback.StackSummary | None):
+        with self._lock:
+            self._lags.append(lag)
+            self.samples += 1
+            self.max_lag = max(self.max_lag, lag)
+            if lag < self.threshold or not stack:
+                return
+
+            self.slow_count += 1
+            site = find_call_site(stack)
+            formatted = [
+                f"{frame.filename}:{frame.lineno} in {frame.name}" for frame in stack
+            ]
+            entry = self.sites.setdefault(
+                site, {"count": 0, "total": 0.0, "max": 0.0, "stack": formatted}
+            )
+            entry["count"] += 1
+            entry["total"] += lag
+            if lag > entry["max"]:
+                # 保留最严重的一次的调用栈
+                entry["max"] = lag
+                entry["stack"] = formatted
+            self.recent.append(
+                {
+                    "at": time.time(),
+                    "duration": round(lag, 4),
+                    "site": site,
+                    "stack": formatted,
+                }
+            )
+
+    def to_dict(self, top: int = 10) -> dict:
+        with self._lock:
+            lags = sorted(self._lags)
+            sites = sorted(
+                self.sites.items(), key=lambda item: item[1]["total"], reverse=True
+            )
+            recent = list(self.recent)
+
+        def percentile(p: float) -> float | None:
+            if not lags:
+                return None
+            return round(lags[min(len(lags) - 1, int(len(lags) * p))], 4)
+
+        return {
+            "running": self.is_running(),
+            "interval": self.interval,
+            "threshold": self.threshold,
+            "lag": {
+                "samples": self.samples,
+                "window": len(lags),
+                "p50": percentile(0.5),
+                "p99": percentile(0.99),
+                "max_in_window": round(lags[-1], 4) if lags else None,
+                "max": round(self.max_lag, 4),
+            },
+            "slow_count": self.slow_count,
+            "sites": [
+                {
+                    "site": site,
+                    "count": entry["count"],
+                    "total": round(entry["total"], 4),
+                    "max": round(entry["max"], 4),
+                    "stack": entry["stack"],
+                }
+                for site, entry in sites[:top]
+            ],
+            "recent": recent,
+        }
+
+
+loop_monitor = LoopMonitor()
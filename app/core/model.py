@@ -0,0 +1,206 @@
+# app/core/model.py
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from app.core.config import CLASS_NAMES_PATH, MODEL_PATH
+from app.utils.image_processing import MODEL_INPUT_SIZE, load_class_names
+from app.utils.startup_profile import mark
+
+log = logging.getLogger("uvicorn")
+
+
+class ModelValidationError(Exception):
+    """新模型与服务要求的输入输出不匹配"""
+
+
+class LoadedModel:
+    """
+    一个已加载的推理模型
+
+    推理时通过 `ModelRegistry.use()` 取得，替换后的旧模型在所有进行中的推理
+    结束后才释放 session
+    """
+
+    def __init__(self, path: Path, class_names_path: Path):
+        self.path = path
+        self.class_names_path = class_names_path
+        self.session = None
+        self.input_name: str | None = None
+        self.batch_size: int | None = None  # 模型固定的 batch 大小，动态 batch 为 None
+        self.class_names: list[str] = []
+        self.load_seconds: float | None = None
+        self.loaded_at: float | None = None
+
+        self.in_flight: int = 0
+        self.retired: bool = False
+
+    def load(self):
+        """加载、校验并预热模型，在线程池中执行"""
+        # onnxruntime 和 numpy 导入较慢，推迟到真正加载模型时
+        import numpy as np
+        import onnxruntime
+
+        start_time = time.perf_counter()
+        providers = (
+            ["CPUExecutionProvider", "CUDAExecutionProvider"]
+            if onnxruntime.get_device() == "GPU"
+            else ["CPUExecutionProvider"]
+        )
+        session = onnxruntime.InferenceSession(str(self.path), providers=providers)
+        class_names = load_class_names(self.class_names_path)
+
+        # 校验输入形状 (N, 3, H, W)，动态维度不做要求
+        model_input = session.get_inputs()[0]
+        width, height = MODEL_INPUT_SIZE
+        for dim, expected in zip(model_input.shape[1:], [3, height, width]):
+            if isinstance(dim, int) and dim != expected:
+                raise ModelValidationError(
+                    f"输入形状不匹配：{model_input.shape}，需要 [N, 3, {height}, {width}]"
+                )
+
+        # 预热，避免第一次推理时的额外开销，同时校验输出类别数
+        batch_size = model_input.shape[0]
+        if not isinstance(batch_size, int):
+            batch_size = None
+        dummy_input = np.zeros((batch_size or 1, 3, height, width), dtype=np.float32)
+        model_output = session.run(None, {model_input.name: dummy_input})[0]
+        if model_output.shape[-1] != len(class_names):
+            raise ModelValidationError(
+                f"类别数不匹配：模型输出 {model_output.shape[-1]} 类，"
+                f"类别文件有 {len(class_names)} 类"
+            )
+
+        self.session = session
+        self.input_name = model_input.name
+        self.batch_size = batch_size
+        self.class_names = class_names
+        self.load_seconds = round(time.perf_counter() - start_time, 4)
+        self.loaded_at = time.time()
+        print(f"Model loaded: {self.path}\nProviders: {session.get_providers()}")
+
+    def release(self):
+        """释放 session 占用的内存（session 没有其它引用，随引用计数归零释放）"""
+        self.session = None
+        log.info(f"已释放旧模型：{self.path}")
+
+    def to_dict(self):
+        return {
+            "path": str(self.path),
+            "class_names_path": str(self.class_names_path),
+            "num_classes": len(self.class_names),
+            "providers": self.session.get_providers() if self.session else None,
+            "load_seconds": self.load_seconds,
+            "loaded_at": self.loaded_at,
+            "in_flight": self.in_flight,
+        }
+
+
+class ModelRegistry:
+    """
+    推理模型注册表
+
+    第一个模型在后台加载，加载完成前服务照常启动，推理需等待 `ready`。
+    之后可以通过 `swap` 在后台加载新模型并原子地替换，不影响进行中的推理
+    """
+
+    def __init__(self):
+        self.status: str = "loading"  # loading, ready, failed
+        self.current: LoadedModel | None = None
+        self.error: str | None = None
+        self.ready = asyncio.Event()
+
+        self.swapping: LoadedModel | None = None
+        self.last_swap_error: str | None = None
+        self._swap_lock = asyncio.Lock()
+
+    async def _load(self, model: LoadedModel):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, model.load)
+        if model.batch_size not in (None, 1):
+            # 服务每次只推理一张图片
+            model.release()
+            raise ModelValidationError(
+                f"模型的 batch 固定为 {model.batch_size}，服务需要 1 或动态 batch"
+            )
+
+    async def load_in_background(self):
+        model = LoadedModel(MODEL_PATH, CLASS_NAMES_PATH)
+        try:
+            await self._load(model)
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            log.error(f"模型加载失败：{e}")
+            return
+
+        if self.current is not None:
+            # 加载期间已经替换了模型，不要用默认模型覆盖
+            log.info("默认模型加载完成时已替换为其它模型，丢弃默认模型")
+            model.release()
+            return
+
+        self.current = model
+        self.status = "ready"
+        self.ready.set()
+        mark("model_ready")
+
+    def is_swapping(self) -> bool:
+        return self._swap_lock.locked()
+
+    async def swap(self, path: Path, class_names_path: Path) -> LoadedModel:
+        """
+        加载新模型并替换当前模型
+
+        新的推理会立即使用新模型，进行中的推理继续使用旧模型直到结束
+        """
+        async with self._swap_lock:
+            model = LoadedModel(path, class_names_path)
+            self.swapping = model
+            try:
+                await self._load(model)
+            except Exception as e:
+                self.last_swap_error = str(e)
+                raise
+            finally:
+                self.swapping = None
+
+            old_model, self.current = self.current, model
+            self.last_swap_error = None
+            if self.status != "ready":
+                self.status = "ready"
+                self.error = None
+                self.ready.set()
+            log.info(f"模型已替换为：{path}")
+
+            if old_model is not None:
+                old_model.retired = True
+                if old_model.in_flight == 0:
+                    old_model.release()
+            return model
+
+    @contextmanager
+    def use(self):
+        """取得当前模型用于一次推理，推理期间即使发生替换也继续使用该模型"""
+        model = self.current
+        model.in_flight += 1
+        try:
+            yield model
+        finally:
+            model.in_flight -= 1
+            if model.retired and model.in_flight == 0:
+                model.release()
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "error": self.error,
+            "current": self.current.to_dict() if self.current else None,
+            "swapping": str(self.swapping.path) if self.swapping else None,
+            "last_swap_error": self.last_swap_error,
+        }
+
+
+model_registry = ModelRegistry()
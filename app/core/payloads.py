@@ -0,0 +1,246 @@
+# app/core/payloads.py
+import base64
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+
+from app.core.config import CANVAS_MEMORY_BUDGET
+from app.core.state import BOOT_ID, canvas_state
+from app.models import PredictionResult
+
+# orjson 比标准库 json 快很多，未安装时退回标准库
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode_json(obj) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # orjson 不支持超过 64 位的整数等，交给标准库处理
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+@dataclass(frozen=True)
+class EncodedPayload:
+    """
+    编码好的 JSON 消息
+
+    WebSocket 直接发送 `text`，REST 直接返回 `body`，不再重复序列化。
+    `body` 在第一次使用时才生成，只通过 WebSocket 发送的消息（如图片）不会保留两份
+    """
+
+    text: str
+    kind: str | None = None  # 消息的 `type`，用于合并同类消息
+
+    @cached_property
+    def body(self) -> bytes:
+        return self.text.encode("utf-8")
+
+    @classmethod
+    def encode(cls, obj) -> "EncodedPayload":
+        kind = obj.get("type") if isinstance(obj, dict) else None
+        return cls(text=encode_json(obj).decode("utf-8"), kind=kind)
+
+
+@dataclass(frozen=True)
+class PredictionPayloads:
+    """一次推理结果对应的所有对外消息"""
+
+    version: int
+    results: list[dict]  # 本次推理的原始结果，揭晓时使用
+    round_stats: dict | None  # 本轮的推理统计，见 `PredictionHistory.stats`
+    top5_message: EncodedPayload  # WebSocket `top5` 消息
+    top1_response: EncodedPayload  # `/api/top1` 响应
+    top5_response: EncodedPayload  # `/api/top5` 响应
+
+
+class PayloadStore:
+    """
+    对外消息的缓存
+
+    每次状态变化时只序列化一次，REST 响应、WebSocket 广播和新连接同步都直接使用
+    """
+
+    def __init__(self):
+        self.predictions: PredictionPayloads | None = None
+        self.image: EncodedPayload | None = None
+        self._game_state: dict | None = None
+        self._game_state_payload: EncodedPayload | None = None
+        # 消息序号，每次上述消息变化时递增并写入消息的 `seq` 字段
+        self.seq: int = 0
+        # 各类消息最后一次变化时的序号
+        self._changed_at: dict[str, int] = {}
+        # 新连接的同步消息，按 `since` 缓存，序号变化时清空
+        self._bootstrap_cache: OrderedDict[int | None, EncodedPayload] = OrderedDict()
+        # 因超出 `CANVAS_MEMORY_BUDGET` 被丢弃的同步消息数
+        self.bootstrap_shed: int = 0
+
+    def _next_seq(self, kind: str) -> int:
+        self.seq += 1
+        self._changed_at[kind] = self.seq
+        self._bootstrap_cache.clear()
+        return self.seq
+
+    def set_predictions(
+        self,
+        results: list[PredictionResult],
+        version: int,
+        display: list[PredictionResult] | None = None,
+        round_stats: dict | None = None,
+    ) -> PredictionPayloads:
+        """
+        `display` 为对外展示的结果（平滑后的 Top-5），默认与 `results` 相同。
+        `top5` 消息同时带上本帧的原始结果 `raw_results`，供回放对比等工具使用
+        """
+        results_list = [{"label": r.label, "score": r.score} for r in results]
+        if display is None:
+            display_list = results_list
+        else:
+            display_list = [{"label": r.label, "score": r.score} for r in display]
+        self.predictions = PredictionPayloads(
+            version=version,
+            results=results_list,
+            round_stats=round_stats,
+            top5_message=EncodedPayload.encode(
+                {
+                    "type": "top5",
+                    "results": display_list,
+                    "raw_results": results_list,
+                    "canvas_version": version,
+                    "round_stats": round_stats,
+                    "seq": self._next_seq("top5"),
+                }
+            ),
+            top1_response=EncodedPayload.encode(
+                {"success": True, "results": display_list[:1]}
+            ),
+            top5_response=EncodedPayload.encode(
+                {"success": True, "results": display_list}
+            ),
+        )
+        return self.predictions
+
+    def set_image(
+        self, image_bytes: bytes, image_type: str, version: int
+    ) -> EncodedPayload:
+        self.image = EncodedPayload.encode(
+            {
+                "type": "image",
+                "image": {
+                    "type": image_type,
+                    "base64": base64.b64encode(image_bytes).decode("utf-8"),
+                },
+                "canvas_version": version,
+                "seq": self._next_seq("image"),
+            }
+        )
+        return self.image
+
+    def game_state(self, state: dict) -> EncodedPayload:
+        """游戏状态消息，状态没有变化时直接返回上次编码的结果"""
+        if state != self._game_state:
+            self._game_state = state
+            self._game_state_payload = EncodedPayload.encode(
+                {
+                    "type": "game_state_update",
+                    "payload": state,
+                    "seq": self._next_seq("game_state_update"),
+                }
+            )
+        return self._game_state_payload
+
+    def bootstrap(self, since: int | None = None) -> EncodedPayload:
+        """
+        新连接的同步消息，包含游戏状态、当前画面和推理结果
+
+        `since` 为客户端已收到的最大序号，此时只包含之后变化过的消息。
+        调用前应先用 `game_state` 刷新游戏状态
+        """
+        if since is not None and since > self.seq:
+            # 来自更新的序号（例如上一个进程），无法判断差异
+            since = None
+        cached = self._bootstrap_cache.get(since)
+        if cached is not None:
+            return cached
+
+        candidates = {
+            "game_state_update": self._game_state_payload,
+            "image": self.image,
+            "top5": self.predictions.top5_message if self.predictions else None,
+        }
+        messages = [
+            payload
+            for kind, payload in candidates.items()
+            if payload is not None
+            and (since is None or self._changed_at.get(kind, 0) > since)
+        ]
+        payload = encode_batch(
+            messages,
+            type="bootstrap",
+            boot_id=BOOT_ID,
+            seq=self.seq,
+            resumed=since is not None,
+        )
+        self._bootstrap_cache[since] = payload
+        self._enforce_budget()
+        return payload
+
+    def _enforce_budget(self):
+        """画面相关的缓存超出预算时，从最旧的同步消息开始丢弃（保留最新的一条）"""
+        retained = self.canvas_memory_usage()["total"]
+        while retained > CANVAS_MEMORY_BUDGET and len(self._bootstrap_cache) > 1:
+            _, dropped = self._bootstrap_cache.popitem(last=False)
+            retained -= len(dropped.text)
+            self.bootstrap_shed += 1
+
+    def canvas_memory_usage(self) -> dict:
+        """画面相关的内存占用，单位字节（字符串按字符数计）"""
+        usage = {
+            "canvas_bytes": canvas_state.memory_usage(),
+            "image_payload": len(self.image.text) if self.image else 0,
+            "bootstrap_cache": sum(
+                len(payload.text) for payload in self._bootstrap_cache.values()
+            ),
+        }
+        usage["total"] = sum(usage.values())
+        usage["bootstrap_cache_entries"] = len(self._bootstrap_cache)
+        usage["bootstrap_shed"] = self.bootstrap_shed
+        return usage
+
+    def memory_usage(self) -> dict:
+        predictions = self.predictions
+        return {
+            "canvas": self.canvas_memory_usage(),
+            "predictions": (
+                len(predictions.top5_message.text)
+                + len(predictions.top1_response.text)
+                + len(predictions.top5_response.text)
+                if predictions
+                else 0
+            ),
+            "game_state": (
+                len(self._game_state_payload.text) if self._game_state_payload else 0
+            ),
+        }
+
+
+def encode_batch(
+    payloads: list[EncodedPayload], type: str = "batch", **fields
+) -> EncodedPayload:
+    """
+    把多条已编码的消息拼接为一条 `batch` 消息，不重新序列化
+
+    `fields` 为 `messages` 之外的其它字段
+    """
+    head = encode_json({"type": type, **fields}).decode("utf-8")[:-1]  # 去掉末尾的 "}"
+    text = head + ',"messages":[' + ",".join(p.text for p in payloads) + "]}"
+    return EncodedPayload(text=text, kind=type)
+
+
+payload_store = PayloadStore()
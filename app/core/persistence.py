@@ -0,0 +1,197 @@
+# app/core/persistence.py
+import asyncio
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+from app.core.config import SNAPSHOT_INTERVAL, SNAPSHOT_MIN_INTERVAL, SNAPSHOT_PATH
+from app.core.payloads import payload_store
+from app.core.state import canvas_state
+from app.utils.fix_job_time import fix_job_time
+import app.core.game_logic as game_logic
+
+log = logging.getLogger("uvicorn")
+
+# 快照文件格式：MAGIC + 4 字节大端头部长度 + JSON 头部 + 画布原始字节
+SNAPSHOT_MAGIC = b"TDGS"
+SNAPSHOT_FORMAT_VERSION = 1
+
+# 游戏状态、画布或推理结果变化时设置，通知快照任务尽快写入
+event_state_changed = asyncio.Event()
+
+# 防止多个线程同时写同一个临时文件
+_write_lock = threading.Lock()
+
+
+def notify_state_changed():
+    event_state_changed.set()
+
+
+def write_snapshot_file(path: Path, header: bytes, canvas_bytes: bytes):
+    """原子地写入快照文件：先写临时文件并落盘，再替换正式文件"""
+    with _write_lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(struct.pack(">I", len(header)))
+            f.write(header)
+            f.write(canvas_bytes)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+def read_snapshot_file(path: Path) -> tuple[dict, bytes] | None:
+    """读取快照文件，返回 (头部, 画布字节)，文件不存在或损坏时返回 None"""
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+    magic_len = len(SNAPSHOT_MAGIC)
+    if data[:magic_len] != SNAPSHOT_MAGIC:
+        log.warning(f"快照文件格式错误，已忽略：{path}")
+        return None
+    try:
+        (header_len,) = struct.unpack_from(">I", data, magic_len)
+        body_start = magic_len + 4
+        header = json.loads(data[body_start : body_start + header_len])
+    except (struct.error, ValueError) as e:
+        log.warning(f"快照文件已损坏，已忽略：{e}")
+        return None
+    if header.get("format") != SNAPSHOT_FORMAT_VERSION:
+        log.warning(f"快照文件版本不兼容，已忽略：{header.get('format')}")
+        return None
+    return header, data[body_start + header_len :]
+
+
+def build_snapshot() -> tuple[bytes, bytes]:
+    """在事件循环内收集当前状态，返回 (JSON 头部, 画布字节)"""
+    from app.core import api
+
+    canvas_bytes = canvas_state.get_latest_canvas_bytes() or b""
+    header = {
+        "format": SNAPSHOT_FORMAT_VERSION,
+        "saved_at": time.time(),
+        "game_state": game_logic.game_state.to_dict(),
+        "canvas": {
+            "type": canvas_state.get_latest_canvas_type(),
+            "version": canvas_state.get_version(),
+        },
+        "predictions": {
+            "version": api.staged_version,
+            "results": (
+                [{"label": r.label, "score": r.score} for r in api.staged_top5]
+                if api.staged_top5 is not None
+                else None
+            ),
+        },
+    }
+    return json.dumps(header).encode("utf-8"), canvas_bytes
+
+
+async def save_snapshot():
+    header, canvas_bytes = build_snapshot()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        None, write_snapshot_file, SNAPSHOT_PATH, header, canvas_bytes
+    )
+
+
+def restore_snapshot() -> bool:
+    """
+    从快照恢复游戏状态、画布和推理结果，应在后台任务启动前调用
+
+    绘画阶段的计时器按照快照保存后经过的时间扣除，若已超时则直接进入等待揭晓；
+    其它阶段计时器没有在运行，计时值恢复为初始值
+    """
+    from app.core import api
+    from app.models import PredictionResult
+
+    snapshot = read_snapshot_file(SNAPSHOT_PATH)
+    if snapshot is None:
+        return False
+    header, canvas_bytes = snapshot
+
+    # 先完整解析快照，字段缺失或类型错误时在修改任何状态之前抛出异常
+    game_logic.GameState().restore(header["game_state"])
+    canvas = header["canvas"]
+    canvas_type = canvas["type"]
+    canvas_version = int(canvas["version"])
+    predictions = header["predictions"]
+    results = predictions["results"]
+    if results is not None:
+        results = [PredictionResult(**r) for r in results]
+    prediction_version = int(predictions["version"])
+    saved_at = float(header["saved_at"])
+
+    game_state = game_logic.game_state
+    game_state.restore(header["game_state"])
+
+    canvas_state.restore(canvas_bytes or None, canvas_type, canvas_version)
+    if canvas_bytes:
+        # 新连接的同步消息需要当前画面
+        payload_store.set_image(canvas_bytes, canvas_type, canvas_version)
+
+    if results is not None:
+        api.staged_top5 = results
+        api.staged_version = prediction_version
+        payload_store.set_predictions(api.staged_top5, api.staged_version)
+    if canvas_state.get_latest_canvas_bytes() is not None and (
+        api.staged_top5 is None or api.staged_version != canvas_state.get_version()
+    ):
+        # 推理结果落后于画布，重新推理
+        api.event_image_updated.set()
+
+    if game_state.phase == "DRAWING":
+        elapsed = time.time() - saved_at
+        remaining = int(game_state.current_timer_value - elapsed)
+        if remaining > 0:
+            game_state.current_timer_value = remaining
+            game_logic.start_event.set()
+            game_logic.reset_event.clear()
+        else:
+            game_state.set_phase("REVEAL_WAITING")
+            game_state.current_timer_value = game_logic.TIMER_MAX_VALUE
+    else:
+        # 计时结束到计时器重置之间保存的快照中计时值为 0，不能沿用
+        game_state.current_timer_value = game_logic.TIMER_MAX_VALUE
+
+    log.info(f"已从快照恢复状态: {game_state.to_dict()}")
+    return True
+
+
+def set_aside_snapshot():
+    """把无法恢复的快照改名保留（用于排查），之后以空状态启动"""
+    bad_path = SNAPSHOT_PATH.with_suffix(SNAPSHOT_PATH.suffix + ".bad")
+    try:
+        os.replace(SNAPSHOT_PATH, bad_path)
+    except OSError as e:
+        log.error(f"移走损坏的快照失败：{e}")
+    else:
+        log.warning(f"损坏的快照已移至 {bad_path}")
+
+
+async def snapshot_task():
+    """
+    后台快照任务。
+
+    状态变化时尽快写入（写入间隔不小于 `SNAPSHOT_MIN_INTERVAL`），
+    无变化时每隔 `SNAPSHOT_INTERVAL` 秒写入一次
+    """
+    while True:
+        try:
+            await asyncio.wait_for(event_state_changed.wait(), SNAPSHOT_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        event_state_changed.clear()
+        async with fix_job_time(SNAPSHOT_MIN_INTERVAL):
+            try:
+                await save_snapshot()
+            except Exception as e:
+                log.error(f"保存快照出现错误：{e}")
@@ -0,0 +1,130 @@
+# app/core/recorder.py
+import json
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator
+
+from app.core.config import RECORD_DIR, RECORD_SESSIONS
+from app.core.state import parse_data_url
+
+# 录制文件格式：
+#   文件头：MAGIC + 1 字节格式版本
+#   每条记录：1 字节类型 + 8 字节时间戳（距录制开始的秒数）+ 4 字节负载长度 + 负载
+RECORD_MAGIC = b"TDGR"
+RECORD_FORMAT_VERSION = 1
+RECORD_HEADER = struct.Struct(">BdI")
+
+KIND_CANVAS = 1  # 负载：media type + b"\0" + 图片原始字节
+KIND_COMMAND = 2  # 负载：JSON 编码的命令
+
+
+class SessionRecorder:
+    """
+    将收到的画布帧和管理员命令按时间顺序写入录制文件，用于之后回放
+
+    写入在单独的线程中按顺序进行，不阻塞事件循环
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.path: Path | None = None
+        self.records: int = 0
+        self._file: BinaryIO | None = None
+        self._started_at: float | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def _open(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = datetime.now().strftime("session-%Y%m%d-%H%M%S.tdgr")
+        self.path = self.directory / name
+        self._file = open(self.path, "wb")
+        self._file.write(RECORD_MAGIC + bytes([RECORD_FORMAT_VERSION]))
+
+    def _write(self, kind: int, timestamp: float, encode: Callable[[], bytes | None]):
+        payload = encode()
+        if payload is None:
+            return
+        if self._file is None:
+            self._open()
+        self._file.write(RECORD_HEADER.pack(kind, timestamp, len(payload)))
+        self._file.write(payload)
+        self._file.flush()
+
+    def _record(
+        self,
+        kind: int,
+        encode: Callable[[], bytes | None],
+        timestamp: float | None = None,
+    ):
+        """`encode` 在写入线程中生成负载，返回 None 时不写入"""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if self._started_at is None:
+            self._started_at = timestamp
+        self.records += 1
+        self._executor.submit(
+            self._write, kind, max(timestamp - self._started_at, 0.0), encode
+        )
+
+    def record_canvas(self, data_url: str, timestamp: float | None = None):
+        """
+        记录收到的画布帧，`timestamp` 为帧到达的时间（`time.monotonic()`）
+
+        data URL 在写入线程中解码，不占用事件循环
+        """
+
+        def encode() -> bytes | None:
+            media_type, raw_bytes = parse_data_url(data_url)
+            if raw_bytes is None:
+                return None
+            return media_type.encode("utf-8") + b"\0" + raw_bytes
+
+        self._record(KIND_CANVAS, encode, timestamp)
+
+    def record_command(self, command: dict, timestamp: float | None = None):
+        payload = json.dumps(command).encode("utf-8")
+        self._record(KIND_COMMAND, lambda: payload, timestamp)
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        """写完所有待写入的记录并关闭文件"""
+        self._executor.submit(self._close)
+        self._executor.shutdown(wait=True)
+
+
+def read_records(path: Path) -> Iterator[tuple[int, float, bytes]]:
+    """依次读取录制文件中的记录，返回 (类型, 时间戳, 负载)"""
+    with open(path, "rb") as f:
+        header = f.read(len(RECORD_MAGIC) + 1)
+        if header[:-1] != RECORD_MAGIC:
+            raise ValueError(f"不是录制文件：{path}")
+        if header[-1] != RECORD_FORMAT_VERSION:
+            raise ValueError(f"录制文件版本不兼容：{header[-1]}")
+
+        while True:
+            record_header = f.read(RECORD_HEADER.size)
+            if len(record_header) < RECORD_HEADER.size:
+                # 文件结束，或进程中断导致最后一条记录不完整
+                return
+            kind, timestamp, length = RECORD_HEADER.unpack(record_header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            yield kind, timestamp, payload
+
+
+def decode_canvas(payload: bytes) -> tuple[str, bytes]:
+    """将画布记录的负载解析为 (media_type, raw_bytes)"""
+    media_type, _, raw_bytes = payload.partition(b"\0")
+    return media_type.decode("utf-8"), raw_bytes
+
+
+# 仅在配置中开启录制时创建
+session_recorder = SessionRecorder(RECORD_DIR) if RECORD_SESSIONS else None
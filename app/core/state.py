@@ -1,6 +1,11 @@
 # app/core/state.py
+import asyncio
 import base64
 import re
+import uuid
+
+# 每次进程启动生成，用于区分不同进程的版本号（例如拼入 ETag）
+BOOT_ID = uuid.uuid4().hex[:8]
 
 
 def parse_data_url(data_url: str) -> tuple[str | None, bytes | None]:
@@ -17,26 +22,83 @@ def parse_data_url(data_url: str) -> tuple[str | None, bytes | None]:
     return None, None
 
 
+class StateVersion:
+    """单调递增的版本号，可以等待版本号更新"""
+
+    def __init__(self):
+        self.value: int = 0
+        self._changed = asyncio.Event()
+
+    def bump(self):
+        self.set(self.value + 1)
+
+    def set(self, value: int):
+        self.value = value
+        # 唤醒所有等待者，之后的等待使用新的 Event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_newer(self, since: int, timeout: float) -> bool:
+        """
+        等待版本号不再等于 `since`，超时返回 False
+
+        `since` 与当前版本号不同（包括来自上一个进程的更大的版本号）时立即返回
+        """
+        if self.value != since:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
 class CanvasState:
     def __init__(self):
-        self._latest_canvas_b64_url: str | None = None
+        # 只保留解码后的字节，data URL 在需要时重新生成，避免同一画面在内存中存两份
         self._latest_canvas_bytes: bytes | None = None
         self._latest_canvas_type: str | None = None
+        # 画布版本号，每次画布内容更新时递增，用于标记推理结果对应的画面
+        self._version = StateVersion()
 
-    def set_latest_canvas(self, data_url: str):
-        self._latest_canvas_b64_url = data_url
+    def set_latest_canvas(self, data_url: str) -> bool:
+        """更新画布，返回 data URL 是否解析成功"""
         media_type, raw_bytes = parse_data_url(data_url)
         if media_type and raw_bytes:
             self._latest_canvas_bytes = raw_bytes
             self._latest_canvas_type = media_type
+            self._version.bump()
 
             from app.core.api import event_image_updated
+            from app.core.persistence import notify_state_changed
             event_image_updated.set()
+            notify_state_changed()
 
             print("canvas state updated")
+            return True
+        return False
+
+    def clear(self):
+        """清空画布，不会触发推理"""
+        self._latest_canvas_bytes = None
+        self._latest_canvas_type = None
+        self._version.bump()
+
+        from app.core.persistence import notify_state_changed
+        notify_state_changed()
+
+    def restore(self, raw_bytes: bytes | None, media_type: str | None, version: int):
+        """从快照恢复画布，不会触发推理"""
+        if raw_bytes and media_type:
+            self._latest_canvas_bytes = raw_bytes
+            self._latest_canvas_type = media_type
+        self._version.set(version)
 
     def get_latest_canvas(self) -> str | None:
-        return self._latest_canvas_b64_url
+        if self._latest_canvas_bytes is None:
+            return None
+        base64_data = base64.b64encode(self._latest_canvas_bytes).decode("utf-8")
+        return f"data:{self._latest_canvas_type};base64,{base64_data}"
 
     def get_latest_canvas_bytes(self) -> bytes | None:
         return self._latest_canvas_bytes
@@ -44,5 +106,15 @@ class CanvasState:
     def get_latest_canvas_type(self) -> str | None:
         return self._latest_canvas_type
 
+    def get_version(self) -> int:
+        return self._version.value
+
+    def memory_usage(self) -> int:
+        """保留的画布数据大小，单位字节"""
+        return len(self._latest_canvas_bytes or b"")
+
+    async def wait_newer(self, since: int, timeout: float) -> bool:
+        return await self._version.wait_newer(since, timeout)
+
 
 canvas_state = CanvasState()
@@ -1,53 +1,264 @@
-import base64
+import asyncio
 import json
 import logging
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, WebSocket
 
 import app.core.game_logic as game_logic
-from app.core.state import canvas_state
-from app.models import PredictionResult
-from app.utils.password import get_password
+from app.core.config import (
+    CANVAS_MAX_FPS,
+    CANVAS_MAX_MESSAGE_SIZE,
+    OUTBOUND_QUEUE_BUDGET,
+)
+from app.core.payloads import (
+    EncodedPayload,
+    PredictionPayloads,
+    encode_batch,
+    payload_store,
+)
+from app.core.recorder import session_recorder
+from app.core.state import BOOT_ID, canvas_state
+from app.utils.fix_job_time import fix_job_time
+from app.utils.password import check_password
 
 router = APIRouter()
 
-active_listeners: list[WebSocket] = []
-
 log = logging.getLogger("uvicorn")
 
+# 画布帧入口的统计：accepted, coalesced, rejected_size, rejected_invalid
+ingress_stats: Counter[str] = Counter()
+
+# 发送队列的统计：因超出预算被丢弃的消息数 shed 及其大小 shed_size
+outbound_stats: Counter[str] = Counter()
+
+
+# 新消息会完整取代旧消息的类型，发送队列积压时可以丢弃较早的同类消息
+SUPERSEDED_KINDS = {"image", "top5", "timer"}
+
+
+class ListenerOutbox:
+    """
+    单个连接的发送队列
+
+    消息由独立的任务逐条发送，慢速连接不会拖慢对其它连接的广播；
+    待发送的消息超过 `OUTBOUND_QUEUE_BUDGET` 时，丢弃已被更新的同类消息取代的
+    `SUPERSEDED_KINDS` 消息，每类只保留最新一条。其它消息（验证结果、游戏状态、
+    最终结果、合并消息等）不会被丢弃
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self._queue: deque[EncodedPayload] = deque()
+        self.pending_size: int = 0  # 待发送消息的总大小（字符数）
+        self._has_pending = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def put(self, payload: EncodedPayload):
+        self._queue.append(payload)
+        self.pending_size += len(payload.text)
+        if self.pending_size > OUTBOUND_QUEUE_BUDGET:
+            self._shed()
+        self._has_pending.set()
+
+    def _shed(self):
+        """丢弃被更新的同类消息取代的消息，其余消息保持原有顺序"""
+        seen: set[str] = set()
+        kept: deque[EncodedPayload] = deque()
+        for payload in reversed(self._queue):
+            if payload.kind in SUPERSEDED_KINDS:
+                if payload.kind in seen:
+                    self.pending_size -= len(payload.text)
+                    outbound_stats["shed"] += 1
+                    outbound_stats["shed_size"] += len(payload.text)
+                    continue
+                seen.add(payload.kind)
+            kept.appendleft(payload)
+        self._queue = kept
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    async def _run(self):
+        while True:
+            await self._has_pending.wait()
+            while self._queue:
+                payload = self._queue.popleft()
+                self.pending_size -= len(payload.text)
+                try:
+                    await self.websocket.send_text(payload.text)
+                except Exception:
+                    # 连接已断开，由接收循环负责清理
+                    self._queue.clear()
+                    self.pending_size = 0
+                    return
+            self._has_pending.clear()
+
+    def close(self):
+        self._task.cancel()
+
+
+active_listeners: dict[WebSocket, ListenerOutbox] = {}
+# 各连接的画布帧入口
+active_ingresses: set["CanvasIngress"] = set()
+
+# 只需保留最新一条的消息类型，同一批次中较早的同类消息会被丢弃
+COALESCED_KINDS = {"game_state_update", "image", "top5", "timer"}
+
+
+class UpdateBatch:
+    """一条命令产生的所有消息，命令执行完后合并为一条消息广播"""
+
+    def __init__(self):
+        self.payloads: list[EncodedPayload] = []
+        self.closed = False
+
+    def add(self, payload: EncodedPayload):
+        self.payloads.append(payload)
+
+    def combine(self) -> EncodedPayload | None:
+        """合并同类消息后编码为一条 `batch` 消息，只有一条时直接返回该消息"""
+        seen: set[str] = set()
+        kept: list[EncodedPayload] = []
+        # 从后往前保留每类消息的最后一条，其余消息保持原有顺序
+        for payload in reversed(self.payloads):
+            if payload.kind in COALESCED_KINDS:
+                if payload.kind in seen:
+                    continue
+                seen.add(payload.kind)
+            kept.append(payload)
+        kept.reverse()
+
+        if not kept:
+            return None
+        if len(kept) == 1:
+            return kept[0]
+        return encode_batch(kept)
+
+
+# 当前正在执行的命令的消息批次，见 `batched_broadcast`
+current_batch: ContextVar[UpdateBatch | None] = ContextVar(
+    "current_batch", default=None
+)
+
+
+@asynccontextmanager
+async def batched_broadcast():
+    """期间广播的消息先暂存，退出时合并为一条消息一次性发送"""
+    batch = UpdateBatch()
+    token = current_batch.set(batch)
+    try:
+        yield batch
+    finally:
+        current_batch.reset(token)
+        batch.closed = True
+        payload = batch.combine()
+        if payload is not None:
+            send_to_listeners(payload)
+
+
+class CanvasIngress:
+    """
+    单个连接的画布帧入口
+
+    帧在独立的任务中按不超过 `CANVAS_MAX_FPS` 的速度处理，
+    上一帧还在处理时到达的帧只保留最新的一帧，接收循环不会被处理过程阻塞
+    """
+
+    def __init__(self):
+        self._pending: str | None = None
+        self._has_pending = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def submit(self, data_url: str):
+        if self._pending is not None:
+            # 旧的帧还没来得及处理，被新帧取代
+            ingress_stats["coalesced"] += 1
+        self._pending = data_url
+        self._has_pending.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._has_pending.wait()
+            self._has_pending.clear()
+            data_url, self._pending = self._pending, None
+            async with fix_job_time(1 / CANVAS_MAX_FPS):
+                try:
+                    await process_canvas_update(data_url)
+                except Exception as e:
+                    log.error(f"处理画布更新出现错误：{e}")
+
+    @property
+    def pending_size(self) -> int:
+        return len(self._pending or "")
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+
+
+async def process_canvas_update(data_url: str):
+    # 1. 更新全局状态
+    if not canvas_state.set_latest_canvas(data_url):
+        ingress_stats["rejected_invalid"] += 1
+        return
+    ingress_stats["accepted"] += 1
+
+    # 2. 解析并广播给 show.html
+    img_bytes = canvas_state.get_latest_canvas_bytes()
+    img_type = canvas_state.get_latest_canvas_type()
+
+    # 3. 广播给 show.html
+    await on_image_updated(img_bytes, img_type)
+
 
 @router.websocket("/listener")
-async def register_listener(websocket: WebSocket):
+async def register_listener(
+    websocket: WebSocket, since: int | None = None, boot_id: str | None = None
+):
     await websocket.accept()
-    active_listeners.append(websocket)
+    outbox = ListenerOutbox(websocket)
+    active_listeners[websocket] = outbox
 
-    # 立即向新客户端同步状态
+    # 立即向新客户端同步状态、画面和推理结果
+    # 重连的客户端带上已收到的最大序号，只同步之后变化过的内容
+    if boot_id != BOOT_ID:
+        since = None
     try:
-        await websocket.send_text(
-            json.dumps(
-                {
-                    "type": "game_state_update",
-                    "payload": game_logic.game_state.to_dict(),
-                }
-            )
-        )
+        payload_store.game_state(game_logic.game_state.to_dict())
+        outbox.put(payload_store.bootstrap(since))
     except Exception as e:
         log.warning(f"初始状态同步失败: {e}")
 
+    ingress = CanvasIngress()
+    active_ingresses.add(ingress)
     try:
         auth_success = False
 
         while True:
-            data = await websocket.receive_json()
+            text = await websocket.receive_text()
+            received_at = time.monotonic()
+            if len(text) > CANVAS_MAX_MESSAGE_SIZE:
+                # 在解析 JSON 之前拒绝过大的消息
+                ingress_stats["rejected_size"] += 1
+                log.warning(f"消息过大（{len(text)} 字符），已拒绝")
+                continue
+            data = json.loads(text)
             type = data.get("type", "")
 
             if type == "auth":
                 # 检查是否通过验证
-                auth_success = data.get("password", "") == get_password()
-                await websocket.send_json({
-                    "type": "auth_result",
-                    "success": auth_success
-                })
+                auth_success = check_password(data.get("password"))
+                outbox.put(
+                    EncodedPayload.encode(
+                        {"type": "auth_result", "success": auth_success}
+                    )
+                )
 
             # 只有通过验证才能向后端发送消息，否则只能监听
             if not auth_success:
@@ -58,59 +269,84 @@ async def register_listener(websocket: WebSocket):
                 data_url = data.get("data_url")
                 if not data_url:
                     continue
+                if not isinstance(data_url, str) or ";base64," not in data_url[:64]:
+                    # 先做廉价的格式检查，避免无效帧顶替掉待处理的有效帧
+                    ingress_stats["rejected_invalid"] += 1
+                    continue
 
-                # 1. 更新全局状态
-                canvas_state.set_latest_canvas(data_url)
-
-                # 2. 解析并广播给 show.html
-                img_bytes = canvas_state.get_latest_canvas_bytes()
-                img_type = canvas_state.get_latest_canvas_type()
+                # 在合并之前录制，保留每一帧和它到达的时间
+                if session_recorder is not None:
+                    session_recorder.record_canvas(data_url, received_at)
 
-                if img_bytes and img_type:
-                    # 3. 广播给 show.html
-                    await on_image_updated(img_bytes, img_type)
+                # 交给入口限速处理，不阻塞接收循环
+                ingress.submit(data_url)
 
             elif type == "command":
-                # 将命令转发给游戏逻辑处理器
-                await game_logic.dispatch(data.get("payload"))
+                if session_recorder is not None:
+                    session_recorder.record_command(data.get("payload"), received_at)
+
+                # 交给命令队列串行执行，不阻塞接收循环
+                game_logic.submit_command(data.get("payload"))
 
     except Exception:
         pass
     finally:
-        active_listeners.remove(websocket)
+        ingress.close()
+        active_ingresses.discard(ingress)
+        outbox.close()
+        del active_listeners[websocket]
 
 
 async def on_image_updated(staged_image_bytes: bytes, staged_image_type: str):
-    await on_boardcast(
-        {
-            "type": "image",
-            "image": {
-                "type": staged_image_type,
-                "base64": base64.b64encode(staged_image_bytes).decode("utf-8"),
-            },
-        }
+    payload = payload_store.set_image(
+        staged_image_bytes, staged_image_type, canvas_state.get_version()
     )
+    await broadcast_payload(payload)
 
 
-async def on_predict_updated(staged_top5: list[PredictionResult]):
-    await on_boardcast(
-        {
-            "type": "top5",
-            "results": [
-                {"label": result.label, "score": result.score} for result in staged_top5
-            ],
-        }
-    )
+def on_predict_updated(payloads: PredictionPayloads):
+    schedule_broadcast(payloads.top5_message)
 
 
 async def on_boardcast(params: dict):
-    json_text = json.dumps(params)
-    for websocket in active_listeners:
-        try:
-            await websocket.send_text(json_text)
-        except WebSocketDisconnect:
-            # 可能会有 WebSocketDisconnet，这里捕获并忽略避免影响其它功能
-            pass
+    await broadcast_payload(EncodedPayload.encode(params))
+
+
+def schedule_broadcast(payload: EncodedPayload):
+    """在命令执行期间并入当前批次，否则直接放入各连接的发送队列"""
+    batch = current_batch.get()
+    if batch is not None and not batch.closed:
+        batch.add(payload)
+    else:
+        send_to_listeners(payload)
+
+
+async def broadcast_payload(payload: EncodedPayload):
+    """向所有监听客户端发送编码好的消息，在命令执行期间并入当前批次"""
+    schedule_broadcast(payload)
+
+
+def send_to_listeners(payload: EncodedPayload):
+    for outbox in active_listeners.values():
+        outbox.put(payload)
+
+
+def memory_usage() -> dict:
+    """各连接待发送消息和待处理画布帧的内存占用，单位字节（按字符数计）"""
+    outboxes = list(active_listeners.values())
+    return {
+        "listeners": len(outboxes),
+        "pending_messages": sum(len(outbox) for outbox in outboxes),
+        "pending_size": sum(outbox.pending_size for outbox in outboxes),
+        "max_pending_size": max(
+            (outbox.pending_size for outbox in outboxes), default=0
+        ),
+        "shed": outbound_stats["shed"],
+        "shed_size": outbound_stats["shed_size"],
+        "ingress_pending_size": sum(
+            ingress.pending_size for ingress in active_ingresses
+        ),
+    }
 
 
 listener_description = """
@@ -118,6 +354,27 @@ listener_description = """
 
 其中包括 `image` 和 `top5` 类型，也包括 `/api/boardcast` 接口广播的内容
 
+连接后首先收到一条 `bootstrap` 消息，`messages` 中包含当前的 `game_state_update`、`image` 和 `top5`
+（尚不存在的会被省略），不需要再轮询 `/api/get_image` 和 `/api/top5`：
+
+```json
+{
+    "type": "bootstrap",
+    "boot_id": "3f9c1a2b",
+    "seq": 42,
+    "resumed": false,
+    "messages": [
+        {"type": "game_state_update", "payload": {"...": "..."}, "seq": 40},
+        {"type": "image", "image": {"...": "..."}, "canvas_version": 12, "seq": 42},
+        {"type": "top5", "results": ["..."], "canvas_version": 12, "seq": 41}
+    ]
+}
+```
+
+`game_state_update`、`image` 和 `top5` 消息带有递增的序号 `seq`。断线重连时可以连接
+`/ws/listener?boot_id=<boot_id>&since=<已收到的最大 seq>`，此时 `bootstrap` 中只包含之后变化过的消息
+（`resumed` 为 `true`）；服务重启过（`boot_id` 不同）时仍会收到完整的内容
+
 JSON 示例：
 
 ```json
@@ -126,7 +383,8 @@ JSON 示例：
     "image": {
         "type": "image/png",
         "base64": "iVBORw0KGgoAAAANSUhEUgAA..."
-    }
+    },
+    "canvas_version": 12
 }
 ```
 
@@ -154,10 +412,37 @@ JSON 示例：
             "label": "kaku_seiga",
             "score": 0.0011601087171584368
         }
+    ],
+    "canvas_version": 12,
+    "round_stats": {
+        "samples": 14,
+        "time_to_first_correct": 6.021,
+        "time_target_top1": 7.985,
+        "target_peak_score": 0.9818522930145264
+    }
+}
+```
+
+`canvas_version` 是画布版本号，每次画布更新时递增，`top5` 中的版本号表示该结果对应的画面
+
+管理员命令引起的多条消息会合并为一条 `batch` 消息，`messages` 中按顺序包含上述各类消息，
+同一批次中的 `game_state_update`、`image`、`top5` 和 `timer` 只保留最后一条：
+
+```json
+{
+    "type": "batch",
+    "messages": [
+        {"type": "game_state_update", "payload": {"round": 1, "phase": "WAITING", "...": "..."}},
+        {"type": "top5", "results": [], "canvas_version": 13, "round_stats": {"...": "..."}},
+        {"type": "image", "image": {"type": "image/png", "base64": ""}, "canvas_version": 13},
+        {"type": "timer", "value": 90, "by": "reset"}
     ]
 }
 ```
 
+`top5` 的 `results` 是最近几次推理平滑后的结果；`round_stats` 是本轮（从开始绘画算起）的统计，
+分别为推理次数、首次猜中目标的时间、目标保持第一的总时长（秒）和目标的最高置信度
+
 前端示例：
 
 ```js
@@ -171,6 +456,9 @@ ws.onmessage = (event) => {
     } else if (data.type === "top5") {
         console.log("Receiving top5 ...")
         // ...
+    } else if (data.type === "batch") {
+        // 按顺序处理其中的每条消息
+        // ...
     }
 };
 ```
@@ -1,3 +1,6 @@
+# 最先导入，以进程导入应用的时刻作为启动计时起点
+from app.utils.startup_profile import mark
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
@@ -41,6 +44,8 @@ app.openapi = custom_openapi
 # 推荐：将静态资源挂载到 /static
 app.mount("/static", StaticFiles(directory="frontend", html=True), name="static")
 
+mark("app_imported")
+
 
 # 根路径重定向到前端首页
 @app.get("/")
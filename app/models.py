@@ -24,3 +24,12 @@ class PredictionResponse(BaseResponse):
     """
 
     results: list[PredictionResult]
+
+
+class ModelSwapRequest(BaseModel):
+    """
+    替换模型的请求，路径均相对于 models 目录
+    """
+
+    path: str  # ONNX 模型文件
+    class_names_path: str = "class_names.json"  # 类别名称文件
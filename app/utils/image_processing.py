@@ -1,30 +1,105 @@
 # app/utils/image_processing.py
 
-import cv2
-import numpy as np
 import json
+from functools import cache
+from pathlib import Path
+from typing import TYPE_CHECKING
+
 from app.models import PredictionResult
 from app.core.config import CLASS_NAMES_PATH
 
+# cv2 和 numpy 导入较慢，推迟到第一次处理图像时再导入
+if TYPE_CHECKING:
+    import numpy as np
+
 # --- 模型输入参数 ---
 MODEL_INPUT_SIZE = (224, 224)  # (width, height)
 
+# --- 画布内容检测参数 ---
+INK_DETECT_SIZE = 64  # 判断空白画布时把笔画掩码缩小到的最长边
+INK_THRESHOLD = 32  # 与白色相差超过该值的像素视为笔画
+MIN_INK_RATIO = 0.002  # 笔画像素占比低于该值时视为空白画布
+CROP_TO_INK = True  # 是否裁剪到笔画所在的区域再缩放
+CROP_PADDING = 0.08  # 裁剪时在笔画外侧留出的边距（占笔画范围边长的比例）
 
-def load_class_names() -> list[str]:
+
+def load_class_names(path: Path = CLASS_NAMES_PATH) -> list[str]:
     """从JSON文件中加载类别名称"""
-    with open(CLASS_NAMES_PATH, "r", encoding="utf-8") as f:
+    with open(path, "r", encoding="utf-8") as f:
         class_names = json.load(f)
     return list(class_names.values())
 
 
 # --- 模型输出参数 (根据您的模型修正) ---
-CLASS_NAMES = load_class_names()
+@cache
+def get_class_names() -> list[str]:
+    """第一次使用时才读取类别名称"""
+    return load_class_names()
+
+
+def find_ink_bbox(image_rgb: "np.ndarray") -> tuple[int, int, int, int] | None:
+    """
+    找到笔画的范围，返回 (x0, y0, x1, y1)，空白画布返回 None
+    """
+    import cv2
+    import numpy as np
+
+    # 先在原图上判断笔画再缩小，细线和浅色笔画不会在缩小时被白色冲淡
+    # 任一通道与白色相差超过阈值即为笔画，浅色（如黄色）的笔画也能被识别
+    lower = 255 - INK_THRESHOLD
+    ink = cv2.inRange(image_rgb, (lower, lower, lower), (255, 255, 255)) == 0
+
+    height, width = ink.shape
+    scale = INK_DETECT_SIZE / max(height, width)
+    if scale < 1:
+        # 对笔画掩码做区域平均，只要格子里有笔画像素结果就大于 0（相当于最大池化）
+        grid = cv2.resize(
+            ink.astype(np.float32),
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+        ink_ratio = np.count_nonzero(grid) / grid.size
+    else:
+        ink_ratio = ink.mean()
+    if ink_ratio < MIN_INK_RATIO:
+        return None
+
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def crop_to_ink(
+    image_rgb: "np.ndarray", bbox: tuple[int, int, int, int]
+) -> "np.ndarray":
+    """以笔画范围为中心裁剪出带边距的正方形区域，超出画布的部分补白"""
+    import cv2
+
+    x0, y0, x1, y1 = bbox
+    side = max(1, int(max(x1 - x0, y1 - y0) * (1 + 2 * CROP_PADDING)))
+    left = (x0 + x1) // 2 - side // 2
+    top = (y0 + y1) // 2 - side // 2
+
+    height, width = image_rgb.shape[:2]
+    pad = max(0, -left, -top, left + side - width, top + side - height)
+    if pad:
+        image_rgb = cv2.copyMakeBorder(
+            image_rgb, pad, pad, pad, pad, cv2.BORDER_CONSTANT, value=(255, 255, 255)
+        )
+        left += pad
+        top += pad
+    return image_rgb[top : top + side, left : left + side]
 
 
-def preprocess_image(image_bytes: bytes) -> np.ndarray:
+def preprocess_image(image_bytes: bytes) -> "np.ndarray | None":
     """
     对输入的图片字节流进行预处理以适应分类模型
+
+    空白画布（没有或只有极少笔画）返回 None，调用方应跳过推理
     """
+    import cv2
+    import numpy as np
+
     # 1. 从字节解码成OpenCV图像格式
     image_np = np.frombuffer(image_bytes, np.uint8)
     image_bgr = cv2.imdecode(image_np, cv2.IMREAD_COLOR)
@@ -32,25 +107,34 @@ def preprocess_image(image_bytes: bytes) -> np.ndarray:
     # 2. 转换颜色通道 BGR -> RGB
     image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
 
-    # 3. 图像缩放 (直接缩放到目标尺寸，分类任务通常不需要letterbox)
+    # 3. 检测笔画范围，空白画布不需要推理；否则裁剪到笔画所在区域
+    bbox = find_ink_bbox(image_rgb)
+    if bbox is None:
+        return None
+    if CROP_TO_INK:
+        image_rgb = crop_to_ink(image_rgb, bbox)
+
+    # 4. 图像缩放 (直接缩放到目标尺寸，分类任务通常不需要letterbox)
     resized_image = cv2.resize(
         image_rgb, MODEL_INPUT_SIZE, interpolation=cv2.INTER_LINEAR
     )
 
-    # 4. 归一化 (0-255 -> 0.0-1.0)
+    # 5. 归一化 (0-255 -> 0.0-1.0)
     image_normalized = resized_image.astype(np.float32) / 255.0
 
-    # 5. 转换维度 HWC -> CHW (Height, Width, Channel -> Channel, Height, Width)
+    # 6. 转换维度 HWC -> CHW (Height, Width, Channel -> Channel, Height, Width)
     image_chw = np.transpose(image_normalized, (2, 0, 1))
 
-    # 6. 增加一个批次维度 NCHW (Batch, Channel, Height, Width)
+    # 7. 增加一个批次维度 NCHW (Batch, Channel, Height, Width)
     input_tensor = np.expand_dims(image_chw, axis=0)
 
     return input_tensor
 
 
 def postprocess_output(
-    model_output: np.ndarray, top_k: int = 1
+    model_output: "np.ndarray",
+    top_k: int = 1,
+    class_names: list[str] | None = None,
 ) -> list[PredictionResult]:
     """
     对分类模型的输出进行后处理，并返回Top-K个结果
@@ -58,10 +142,16 @@ def postprocess_output(
     Args:
         model_output (np.ndarray): 模型的原始输出
         top_k (int): 需要返回的前k个结果数量
+        class_names (list[str] | None): 模型对应的类别名称，默认使用 `CLASS_NAMES_PATH`
 
     Returns:
         list[PredictionResult]: 包含k个预测结果的列表
     """
+    import numpy as np
+
+    if class_names is None:
+        class_names = get_class_names()
+
     # 1. 移除批次维度 (1, 135) -> (135,)
     probabilities = model_output[0]
 
@@ -74,7 +164,7 @@ def postprocess_output(
     results = []
     for i in top_k_indices:
         results.append(
-            PredictionResult(label=CLASS_NAMES[i], score=float(probabilities[i]))
+            PredictionResult(label=class_names[i], score=float(probabilities[i]))
         )
 
     return results
@@ -0,0 +1,78 @@
+import os
+import sys
+import tracemalloc
+
+
+def get_rss() -> int | None:
+    """当前进程的常驻内存（RSS），单位字节，无法获取时返回 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def get_peak_rss() -> int | None:
+    """进程启动以来的最大常驻内存，单位字节，无法获取（如 Windows）时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 的单位是 KB，macOS 是字节
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class TracemallocDiff:
+    """
+    按需开启 tracemalloc，每次查询返回与上一次快照相比增长最多的分配位置
+
+    tracemalloc 开启后所有内存分配都会变慢，排查完应及时关闭
+    """
+
+    def __init__(self):
+        self._previous: tracemalloc.Snapshot | None = None
+
+    def is_tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._previous = None
+
+    def stop(self):
+        tracemalloc.stop()
+        self._previous = None
+
+    def top_diff(self, top_n: int = 10) -> list[dict]:
+        """
+        拍摄新快照并与上一次快照比较，返回增长最多的 `top_n` 个分配位置
+
+        第一次调用时没有可比较的快照，返回当前占用最多的位置。耗时较长，应在线程池中调用
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            )
+        )
+        if self._previous is None:
+            stats = snapshot.statistics("lineno")
+        else:
+            stats = snapshot.compare_to(self._previous, "lineno")
+        self._previous = snapshot
+
+        return [
+            {
+                "location": str(stat.traceback[0]),
+                "size": stat.size,
+                "size_diff": getattr(stat, "size_diff", stat.size),
+                "count": stat.count,
+                "count_diff": getattr(stat, "count_diff", stat.count),
+            }
+            for stat in stats[:top_n]
+        ]
+
+
+tracemalloc_diff = TracemallocDiff()
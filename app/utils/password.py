@@ -14,3 +14,9 @@ def get_password() -> str | None:
             return f.read()
     except FileNotFoundError:
         return None
+
+
+def check_password(password: str | None) -> bool:
+    """未设置密码时拒绝所有验证"""
+    expected = get_password()
+    return expected is not None and password == expected
@@ -0,0 +1,15 @@
+import time
+
+# 以本模块首次被导入的时间作为启动起点（app.main 最先导入本模块）
+STARTED_AT = time.perf_counter()
+
+_marks: dict[str, float] = {}
+
+
+def mark(name: str):
+    """记录启动过程中的一个时间点（距启动起点的秒数）"""
+    _marks[name] = round(time.perf_counter() - STARTED_AT, 4)
+
+
+def get_startup_profile() -> dict[str, float]:
+    return dict(_marks)
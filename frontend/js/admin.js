@@ -14,6 +14,7 @@
 	const nextTryBtn = document.getElementById("next-try-btn"); // 第二次尝试
 	const revealBtn = document.getElementById("reveal-results-btn"); // 显示结果
 	const top5List = document.getElementById("top5-list"); // Top 5 列表
+	const roundStats = document.getElementById("round-stats"); // 本轮统计
 
 	// 按钮状态设置辅助函数，注意变量值为disabled
 	function setAllButtons(disabled) {
@@ -27,13 +28,19 @@
 
 	// --- 2. WebSocket 核心 ---
 	let ws = null;
+	// 已收到的最大消息序号，重连时只同步之后变化过的内容
+	let bootId = null;
+	let lastSeq = null;
 
 	function connect(password) {
 		// (使用与 canvas.config.js 相同的逻辑)
-		const wsURL =
+		let wsURL =
 			(window.location.protocol === "https:" ? "wss://" : "ws://") +
 			window.location.host +
 			"/ws/listener"; //
+		if (bootId !== null && lastSeq !== null) {
+			wsURL += `?boot_id=${bootId}&since=${lastSeq}`;
+		}
 
 		ws = new WebSocket(wsURL);
 
@@ -81,7 +88,20 @@
 	// --- 3. 消息处理器 ---
 	function handleMessage(data) {
 		console.log("📩 [AdminWS] 收到消息:", data);
+		if (typeof data.seq === "number" && data.seq > (lastSeq ?? -1)) {
+			lastSeq = data.seq;
+		}
 		switch (data.type) {
+			case "bootstrap":
+				// 连接后的初始同步（游戏状态、画面和推理结果）
+				bootId = data.boot_id;
+				lastSeq = data.seq;
+				data.messages.forEach(handleMessage);
+				break;
+			case "batch":
+				// 一条命令引起的多条消息，按顺序逐条处理
+				data.messages.forEach(handleMessage);
+				break;
 			case "auth_result":
 				processAuthResult(data.success);
 			case "timer":
@@ -92,6 +112,10 @@
 				break;
 			case "top5":
 				updateTop5List(data.results);
+				updateRoundStats(data.round_stats);
+				break;
+			case "final_results":
+				updateRoundStats(data.payload?.round_stats);
 				break;
 			case "image":
 				// Admin 页面暂时不需要这些
@@ -224,6 +248,28 @@
 		}
 	}
 
+	// 本轮统计更新函数
+	/**
+	 * @param {{samples: number, time_to_first_correct: number | null,
+	 *          time_target_top1: number, target_peak_score: number | null}} stats
+	 */
+	function updateRoundStats(stats) {
+		if (!roundStats || !stats) return;
+
+		const firstCorrect =
+			stats.time_to_first_correct === null
+				? "未猜中"
+				: `${stats.time_to_first_correct.toFixed(1)}s`;
+		const peak =
+			stats.target_peak_score === null
+				? "n/a"
+				: `${(stats.target_peak_score * 100).toFixed(1)}%`;
+		roundStats.textContent =
+			`本轮统计：首次猜中 ${firstCorrect}，` +
+			`目标保持第一 ${stats.time_target_top1.toFixed(1)}s，` +
+			`目标最高置信度 ${peak}（${stats.samples} 次推理）`;
+	}
+
 	// --- 5. 事件监听 ---
 	resetBtn.addEventListener("click", () => {
 		console.log("➡️ [AdminWS] 发送: 重置计时器");
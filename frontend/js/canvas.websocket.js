@@ -8,7 +8,13 @@
 
 	// ========= WebSocket（保留原逻辑） =========
 	App.connectWebSocket = function (password) {
-		App.socket = new WebSocket(App.config.WS_URL);
+		App.password = password; // 重连时使用
+		let url = App.config.WS_URL;
+		// 重连时带上已收到的最大消息序号，只同步之后变化过的内容
+		if (App.bootId && App.lastSeq !== undefined) {
+			url += `?boot_id=${App.bootId}&since=${App.lastSeq}`;
+		}
+		App.socket = new WebSocket(url);
 
 		App.socket.addEventListener("open", () => {
 			console.log("[WS] connected");
@@ -55,7 +61,7 @@
 		if (App.reconnectTimer) return;
 		App.reconnectTimer = setTimeout(() => {
 			console.log("[WS] attempting reconnect...");
-			App.connectWebSocket(password);
+			App.connectWebSocket(App.password);
 		}, 2000 + Math.random() * 3000);
 	};
 
@@ -80,8 +86,21 @@
 	};
 
 	App.handleServerMessage = function (msg) {
+		if (typeof msg.seq === "number" && msg.seq > (App.lastSeq ?? -1)) {
+			App.lastSeq = msg.seq;
+		}
 		// 根据消息类型处理
 		switch (msg.type) {
+			case "bootstrap":
+				// 连接后的初始同步（游戏状态、画面和推理结果）
+				App.bootId = msg.boot_id;
+				App.lastSeq = msg.seq;
+				msg.messages.forEach(App.handleServerMessage);
+				break;
+			case "batch":
+				// 一条命令引起的多条消息，按顺序逐条处理
+				msg.messages.forEach(App.handleServerMessage);
+				break;
 			case "auth_result":
 				App.processAuthResult(msg.success);
 			case "timer":
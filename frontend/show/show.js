@@ -174,40 +174,47 @@ ws.onmessage = (event) => {
 	try {
 		const data = JSON.parse(event.data); // 解析接收的数据，转化为js格式的字符串
 		console.log("📩 收到消息:", data);
-
-		switch (
-			data.type // switch语句，根据不同的type类型，调用不同的更新函数
-		) {
-			case "image":
-				updateImage(data.image); // 若是图片，执行图片更新函数
-				break; // 跳出switch语句
-			case "top5":
-				updateTop5(data.results);
-				break;
-			case "timer":
-				updateTimer(data);
-				break;
-			case "game_state_update": // 游戏状态更新
-				updateGameState(data.payload);
-				break;
-			case "final_results": // 最终结果
-				console.log("最终结果:", data.payload);
-				if (data.payload && data.payload.results) {
-					// (true = 强制显示)
-					updateTop5(data.payload.results, true);
-				}
-				break;
-			// 若上述全不匹配，执行默认逻辑
-			default:
-				console.log("⚙️ 其它类型消息:", data);
-				break;
-		}
+		handleMessage(data);
 		// 若上面try失败，则启动catch，捕获解析错误
 	} catch (err) {
 		console.error("❌ JSON 解析错误:", err, event.data);
 	}
 };
 
+function handleMessage(data) {
+	switch (
+		data.type // switch语句，根据不同的type类型，调用不同的更新函数
+	) {
+		case "bootstrap": // 连接后的初始同步（游戏状态、画面和推理结果）
+		case "batch": // 一条命令引起的多条消息，按顺序逐条处理
+			data.messages.forEach(handleMessage);
+			break;
+		case "image":
+			updateImage(data.image); // 若是图片，执行图片更新函数
+			break; // 跳出switch语句
+		case "top5":
+			updateTop5(data.results);
+			break;
+		case "timer":
+			updateTimer(data);
+			break;
+		case "game_state_update": // 游戏状态更新
+			updateGameState(data.payload);
+			break;
+		case "final_results": // 最终结果
+			console.log("最终结果:", data.payload);
+			if (data.payload && data.payload.results) {
+				// (true = 强制显示)
+				updateTop5(data.payload.results, true);
+			}
+			break;
+		// 若上述全不匹配，执行默认逻辑
+		default:
+			console.log("⚙️ 其它类型消息:", data);
+			break;
+	}
+}
+
 ws.onclose = () => {
 	console.warn("🔌 WebSocket 已断开，尝试重连...");
 	setTimeout(() => location.reload(), 2000);
@@ -392,6 +399,12 @@ function updateTop5(results, forceShow = false) {
 		return;
 	}
 
+	// 空结果 (后端判断画布为空白时不做推理)
+	if (results.length === 0) {
+		resetTop5Display();
+		return;
+	}
+
 	// 定义格式化名称的函数
 	function formatName(label) {
 		return label
@@ -0,0 +1,289 @@
+"""
+离线批量评估脚本
+
+对按类别分目录存放的画作评估模型效果，目录结构：
+    dataset/
+    ├── hakurei_reimu/
+    │   ├── 001.png
+    │   └── ...
+    └── kirisame_marisa/
+        └── ...
+
+预处理、推理和后处理直接使用服务端的 `preprocess_image`、`LoadedModel`
+和 `postprocess_output`，保证离线结果与线上一致。
+
+在项目根目录执行：
+    python scripts/evaluate.py dataset --output eval_output
+    # 中断后继续（跳过检查点中已评估的图片）
+    python scripts/evaluate.py dataset --output eval_output --resume
+
+输出：
+    predictions.jsonl    每张图片的 Top-K 结果，同时作为检查点
+    confusion_matrix.csv 混淆矩阵（行：真实类别，列：Top-1 预测类别）
+    per_class.csv        每个类别的 Top-1 / Top-K 准确率
+    summary.json         总体准确率和吞吐量
+
+空白画布（预处理判断没有笔画）与线上一样不做推理，预测类别记为 (empty)
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import CLASS_NAMES_PATH, CPU_WORKER_COUNT, MODEL_PATH  # noqa: E402
+from app.core.model import LoadedModel  # noqa: E402
+from app.utils.image_processing import (  # noqa: E402
+    postprocess_output,
+    preprocess_image,
+)
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp", ".bmp"}
+
+
+def find_images(dataset: Path) -> list[tuple[str, str]]:
+    """返回 (图片路径, 真实类别) 列表，类别为图片所在的子目录名"""
+    images = []
+    for label_dir in sorted(p for p in dataset.iterdir() if p.is_dir()):
+        for path in sorted(label_dir.rglob("*")):
+            if path.suffix.lower() in IMAGE_SUFFIXES:
+                images.append((str(path), label_dir.name))
+    return images
+
+
+# 预处理判断为空白画布时的预测结果，与服务端发布空结果一致
+EMPTY_LABEL = "(empty)"
+
+
+def load_and_preprocess(path: str) -> tuple[bool, object]:
+    """在子进程中读取并预处理图片，返回 (是否成功, 张量)，空白画布的张量为 None"""
+    try:
+        with open(path, "rb") as f:
+            return True, preprocess_image(f.read())
+    except Exception:
+        return False, None
+
+
+def load_checkpoint(path: Path) -> dict[str, dict]:
+    records = {}
+    if not path.exists():
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 中断时可能写了半行
+                continue
+            records[record["path"]] = record
+    return records
+
+
+def batched(iterable, n: int):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, n)):
+        yield batch
+
+
+def preprocess_in_window(executor: ProcessPoolExecutor, paths: list[str], window: int):
+    """
+    按顺序返回预处理结果，最多同时提交 `window` 张图片
+
+    一次性提交全部图片时，子进程会远远跑在推理前面，预处理好的张量全部堆积在内存中
+    """
+    iterator = iter(paths)
+    futures = deque(
+        executor.submit(load_and_preprocess, path) for path in islice(iterator, window)
+    )
+    while futures:
+        result = futures.popleft().result()
+        for path in islice(iterator, 1):
+            futures.append(executor.submit(load_and_preprocess, path))
+        yield result
+
+
+def run_batch(model: LoadedModel, tensors: list, batch_size: int):
+    """推理一批张量，模型不支持动态 batch 时逐张推理"""
+    import numpy as np
+
+    if batch_size > 1:
+        batch = np.concatenate(tensors)
+        padding = batch_size - len(tensors)
+        if padding > 0 and model.batch_size is not None:
+            # batch 固定的模型，最后一批不满时补零，多出的结果丢弃
+            batch = np.concatenate(
+                [batch, np.zeros((padding, *batch.shape[1:]), dtype=batch.dtype)]
+            )
+        model_output = model.session.run(None, {model.input_name: batch})[0]
+        return [model_output[i : i + 1] for i in range(len(tensors))]
+    return [
+        model.session.run(None, {model.input_name: tensor})[0] for tensor in tensors
+    ]
+
+
+def evaluate(args) -> tuple[list[dict], float | None]:
+    """返回全部评估记录和本次的吞吐量，本次没有评估任何图片时吞吐量为 None"""
+    images = find_images(args.dataset)
+    checkpoint_path = args.output / "predictions.jsonl"
+    records = load_checkpoint(checkpoint_path) if args.resume else {}
+    todo = [(path, label) for path, label in images if path not in records]
+    print(f"共 {len(images)} 张图片，已评估 {len(records)} 张，待评估 {len(todo)} 张")
+
+    model = LoadedModel(args.model, args.class_names)
+    model.load()
+
+    batch_size = args.batch_size
+    if model.batch_size is not None and model.batch_size != batch_size:
+        print(f"模型输入的 batch 固定为 {model.batch_size}，按该大小推理")
+        batch_size = model.batch_size
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    start_time = time.perf_counter()
+    evaluated = 0
+    with (
+        ProcessPoolExecutor(max_workers=args.workers) as executor,
+        open(checkpoint_path, "a" if args.resume else "w", encoding="utf-8") as f,
+    ):
+        tensors = preprocess_in_window(
+            executor, [path for path, _ in todo], args.batch_size * args.workers
+        )
+        for batch in batched(zip(todo, tensors), args.batch_size):
+            valid = []
+            for (path, label), (ok, tensor) in batch:
+                if not ok:
+                    print(f"无法读取图片，已跳过：{path}")
+                elif tensor is None:
+                    # 空白画布不推理
+                    record = {"path": path, "label": label, "top_k": [], "scores": []}
+                    records[path] = record
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    evaluated += 1
+                else:
+                    valid.append(((path, label), tensor))
+
+            for chunk in batched(valid, batch_size):
+                outputs = run_batch(model, [tensor for _, tensor in chunk], batch_size)
+                for ((path, label), _), output in zip(chunk, outputs):
+                    results = postprocess_output(
+                        output, top_k=args.top_k, class_names=model.class_names
+                    )
+                    record = {
+                        "path": path,
+                        "label": label,
+                        "top_k": [r.label for r in results],
+                        "scores": [r.score for r in results],
+                    }
+                    records[path] = record
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    evaluated += 1
+            f.flush()
+
+    elapsed = time.perf_counter() - start_time
+    if evaluated == 0:
+        print("本次没有需要评估的图片")
+        return list(records.values()), None
+    throughput = evaluated / elapsed if elapsed > 0 else 0.0
+    print(f"本次评估 {evaluated} 张，耗时 {elapsed:.2f}s，{throughput:.1f} images/sec")
+
+    return list(records.values()), throughput
+
+
+def write_reports(args, records: list[dict], throughput: float | None):
+    top_k = args.top_k
+    total = len(records)
+    top1_correct = Counter()
+    topk_correct = Counter()
+    per_class_total = Counter()
+    confusion = defaultdict(Counter)
+
+    for record in records:
+        label = record["label"]
+        per_class_total[label] += 1
+        top1 = record["top_k"][0] if record["top_k"] else EMPTY_LABEL
+        confusion[label][top1] += 1
+        if top1 == label:
+            top1_correct[label] += 1
+        if label in record["top_k"][:top_k]:
+            topk_correct[label] += 1
+
+    labels = sorted(
+        set(per_class_total) | {p for row in confusion.values() for p in row}
+    )
+    with open(
+        args.output / "confusion_matrix.csv", "w", newline="", encoding="utf-8"
+    ) as f:
+        writer = csv.writer(f)
+        writer.writerow(["label", *labels])
+        for label in sorted(per_class_total):
+            writer.writerow([label, *(confusion[label][p] for p in labels)])
+
+    with open(args.output / "per_class.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["label", "count", "top1_accuracy", f"top{top_k}_accuracy"])
+        for label in sorted(per_class_total):
+            count = per_class_total[label]
+            writer.writerow(
+                [
+                    label,
+                    count,
+                    round(top1_correct[label] / count, 4),
+                    round(topk_correct[label] / count, 4),
+                ]
+            )
+
+    summary = {
+        "model": str(args.model),
+        "images": total,
+        "top1_accuracy": (
+            round(sum(top1_correct.values()) / total, 4) if total else None
+        ),
+        f"top{top_k}_accuracy": (
+            round(sum(topk_correct.values()) / total, 4) if total else None
+        ),
+    }
+    summary_path = args.output / "summary.json"
+    if throughput is not None:
+        summary["images_per_sec"] = round(throughput, 2)
+    elif summary_path.exists():
+        # 本次没有评估新的图片（如 --resume 时已全部完成），沿用上次的吞吐量
+        try:
+            previous = json.loads(summary_path.read_text(encoding="utf-8"))
+        except ValueError:
+            previous = {}
+        if "images_per_sec" in previous:
+            summary["images_per_sec"] = previous["images_per_sec"]
+    summary_path.write_text(
+        json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8"
+    )
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线批量评估模型")
+    parser.add_argument("dataset", type=Path, help="按类别分目录的画作目录")
+    parser.add_argument("--output", type=Path, default=Path("eval_output"))
+    parser.add_argument("--model", type=Path, default=MODEL_PATH)
+    parser.add_argument("--class-names", type=Path, default=CLASS_NAMES_PATH)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument(
+        "--workers", type=int, default=CPU_WORKER_COUNT, help="预处理的进程数"
+    )
+    parser.add_argument(
+        "--resume", action="store_true", help="从检查点继续，跳过已评估的图片"
+    )
+    args = parser.parse_args()
+
+    records, throughput = evaluate(args)
+    write_reports(args, records, throughput)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+启动耗时分析脚本
+
+在项目根目录执行：
+    python scripts/profile_startup.py
+
+1. 使用 `python -X importtime` 统计导入 app.main 的耗时，列出最慢的模块
+2. 在进程内执行一次完整的启动流程（lifespan），输出各阶段耗时和模型加载耗时
+
+分析时不读取也不写入状态快照，不会影响正在运行的服务
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def profile_imports(top: int):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr)
+        sys.exit(proc.returncode)
+
+    # 格式：import time: self [us] | cumulative | imported package
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+
+    total_us = sum(self_us for _, self_us, _ in rows)
+    print(f"导入 app.main 总耗时：{total_us / 1000:.1f} ms（{len(rows)} 个模块）")
+    print(f"{'cumulative(ms)':>15} {'self(ms)':>10}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>15.1f} {self_us / 1000:>10.1f}  {name}")
+
+
+async def profile_lifespan(timeout: float):
+    sys.path.insert(0, str(BASE_DIR))
+    # 关闭快照，避免用过期的状态覆盖正在运行的服务的快照
+    os.environ["PERSIST_STATE"] = "0"
+
+    start_time = time.perf_counter()
+    from app.main import app
+    from app.core.model import model_registry
+    from app.utils.startup_profile import get_startup_profile
+
+    print(f"\n进程内导入 app.main：{(time.perf_counter() - start_time) * 1000:.1f} ms")
+
+    async with app.router.lifespan_context(app):
+        try:
+            await asyncio.wait_for(model_registry.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            print(f"模型在 {timeout} 秒内未就绪")
+
+        print("启动各阶段（距启动起点的秒数）：")
+        for name, seconds in get_startup_profile().items():
+            print(f"  {name:<20} {seconds:.4f}")
+        print(f"模型状态：{model_registry.to_dict()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析服务的导入与启动耗时")
+    parser.add_argument("--top", type=int, default=20, help="列出最慢的模块数量")
+    parser.add_argument(
+        "--timeout", type=float, default=60, help="等待模型就绪的最长时间，单位秒"
+    )
+    parser.add_argument(
+        "--imports-only", action="store_true", help="只统计导入耗时，不执行启动流程"
+    )
+    args = parser.parse_args()
+
+    profile_imports(args.top)
+    if not args.imports_only:
+        asyncio.run(profile_lifespan(args.timeout))
+
+
+if __name__ == "__main__":
+    main()
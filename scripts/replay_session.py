@@ -0,0 +1,245 @@
+"""
+录制回放脚本
+
+将 `RECORD_SESSIONS=1` 时录制的文件（recordings/*.tdgr）通过 `/ws/listener`
+回放给本地运行的服务，统计推理结果和延迟，并可与之前的回放结果对比。
+
+在项目根目录执行：
+    # 按原速回放，并保存结果
+    python scripts/replay_session.py recordings/session-xxx.tdgr --output base.json
+    # 10 倍速回放，与之前的结果对比
+    python scripts/replay_session.py recordings/session-xxx.tdgr --speed 10 --compare base.json
+    # 不等待，尽快发送
+    python scripts/replay_session.py recordings/session-xxx.tdgr --speed max
+
+注意：回放时服务上不应有其他画布在发送画面，否则版本号对应关系会错乱
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+import websockets
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.recorder import (  # noqa: E402
+    KIND_CANVAS,
+    KIND_COMMAND,
+    decode_canvas,
+    read_records,
+)
+
+
+class Replay:
+    def __init__(self, path: Path, speed: float | None):
+        self.records = list(read_records(path))
+        self.speed = speed  # None 表示不等待
+
+        # 已发送、尚未收到回显的画布帧：(帧序号, 发送时间, base64)
+        self.pending_frames: deque[tuple[int, float, str]] = deque()
+        # 画布版本号 -> (帧序号, 发送时间)
+        self.version_frames: dict[int, tuple[int, float]] = {}
+
+        self.frames_sent = 0
+        self.predictions: dict[int, dict] = {}  # 帧序号 -> 推理结果
+        self.final_results: list[dict] = []
+        self.latencies: list[float] = []
+
+    async def send(self, ws):
+        start_time = time.monotonic()
+        for kind, timestamp, payload in self.records:
+            if self.speed is not None:
+                delay = start_time + timestamp / self.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            if kind == KIND_CANVAS:
+                media_type, raw_bytes = decode_canvas(payload)
+                base64_data = base64.b64encode(raw_bytes).decode("utf-8")
+                data_url = f"data:{media_type};base64,{base64_data}"
+                self.pending_frames.append(
+                    (self.frames_sent, time.monotonic(), base64_data)
+                )
+                self.frames_sent += 1
+                await ws.send(json.dumps({"type": "canvas_update", "data_url": data_url}))
+            elif kind == KIND_COMMAND:
+                await ws.send(
+                    json.dumps({"type": "command", "payload": json.loads(payload)})
+                )
+
+    async def receive(self, ws):
+        async for message in ws:
+            self.handle_message(json.loads(message))
+
+    def handle_message(self, data: dict):
+        message_type = data.get("type")
+
+        if message_type == "batch":
+            # 一条命令引起的多条消息合并在一起，按顺序逐条处理
+            for message in data.get("messages", []):
+                self.handle_message(message)
+
+        elif message_type == "image":
+            # 服务会把画面回显给所有监听者（包括自己），借此得到帧对应的版本号
+            # 服务端限速时会丢弃来不及处理的旧帧，这些帧不会有回显
+            base64_data = (data.get("image") or {}).get("base64")
+            if not base64_data:
+                return
+            while self.pending_frames:
+                frame_index, sent_at, sent_base64 = self.pending_frames.popleft()
+                if sent_base64 == base64_data:
+                    self.version_frames[data["canvas_version"]] = (
+                        frame_index,
+                        sent_at,
+                    )
+                    break
+
+        elif message_type == "top5":
+            frame = self.version_frames.get(data.get("canvas_version"))
+            if frame is None:
+                return
+            frame_index, sent_at = frame
+            latency = time.monotonic() - sent_at
+            self.latencies.append(latency)
+            # 对比使用本帧的原始结果，平滑后的结果受前几帧和到达时间影响
+            self.predictions[frame_index] = {
+                "raw_results": data["raw_results"],
+                "latency": latency,
+            }
+
+        elif message_type == "final_results":
+            payload = data.get("payload") or {}
+            frame = self.version_frames.get(payload.get("canvas_version"))
+            self.final_results.append(
+                {
+                    "frame": frame[0] if frame else None,
+                    "results": payload.get("results", []),
+                }
+            )
+
+    async def run(self, url: str, password: str, drain: float):
+        async with websockets.connect(url, max_size=None) as ws:
+            await ws.send(json.dumps({"type": "auth", "password": password}))
+            while True:
+                data = json.loads(await ws.recv())
+                if data.get("type") == "auth_result":
+                    if not data.get("success"):
+                        raise SystemExit("密码错误")
+                    break
+
+            receiver = asyncio.create_task(self.receive(ws))
+            await self.send(ws)
+            # 等待最后几帧的推理结果
+            await asyncio.sleep(drain)
+            receiver.cancel()
+
+    def report(self):
+        print(f"记录数：{len(self.records)}，发送画布帧：{self.frames_sent}")
+        print(f"收到推理结果：{len(self.predictions)} 帧")
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(
+                "延迟（发送画面 -> 收到 top5）："
+                f"p50={statistics.median(latencies) * 1000:.1f}ms "
+                f"p95={p95 * 1000:.1f}ms "
+                f"max={latencies[-1] * 1000:.1f}ms"
+            )
+        for final in self.final_results:
+            top1 = final["results"][0] if final["results"] else None
+            print(f"最终结果（帧 {final['frame']}）：{top1}")
+
+    def to_dict(self):
+        return {
+            "predictions": {str(k): v for k, v in sorted(self.predictions.items())},
+            "final_results": self.final_results,
+        }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> int:
+    """对比两次回放中相同帧的推理结果，返回不一致的数量"""
+    divergences = 0
+
+    common_frames = current["predictions"].keys() & baseline["predictions"].keys()
+    for frame in sorted(common_frames, key=int):
+        results = current["predictions"][frame]["raw_results"]
+        base_results = baseline["predictions"][frame]["raw_results"]
+        labels = [r["label"] for r in results]
+        base_labels = [r["label"] for r in base_results]
+        scores = [r["score"] for r in results]
+        base_scores = [r["score"] for r in base_results]
+        if labels != base_labels:
+            divergences += 1
+            print(f"帧 {frame} 结果不一致：{labels} != {base_labels}")
+        elif any(abs(a - b) > tolerance for a, b in zip(scores, base_scores)):
+            divergences += 1
+            print(f"帧 {frame} 置信度差异超过 {tolerance}：{scores} != {base_scores}")
+
+    for final, base_final in zip(current["final_results"], baseline["final_results"]):
+        labels = [r["label"] for r in final["results"]]
+        base_labels = [r["label"] for r in base_final["results"]]
+        if labels != base_labels:
+            divergences += 1
+            print(f"最终结果不一致：{labels} != {base_labels}")
+
+    print(f"对比了 {len(common_frames)} 帧，{divergences} 处不一致")
+    return divergences
+
+
+def parse_speed(value: str) -> float | None:
+    if value == "max":
+        return None
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed 必须大于 0")
+    return speed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放录制的画布会话")
+    parser.add_argument("recording", type=Path, help="录制文件路径")
+    parser.add_argument(
+        "--url", default="ws://127.0.0.1:8000/ws/listener", help="服务地址"
+    )
+    parser.add_argument(
+        "--password", help="管理员密码，默认读取 password.txt", default=None
+    )
+    parser.add_argument(
+        "--speed", type=parse_speed, default=1.0, help="回放倍速，或 max 表示不等待"
+    )
+    parser.add_argument(
+        "--drain", type=float, default=3, help="发送完成后等待结果的时间，单位秒"
+    )
+    parser.add_argument("--output", type=Path, help="保存本次回放结果的 JSON 文件")
+    parser.add_argument("--compare", type=Path, help="与之前保存的回放结果对比")
+    parser.add_argument(
+        "--tolerance", type=float, default=1e-4, help="对比时允许的置信度误差"
+    )
+    args = parser.parse_args()
+
+    password = args.password
+    if password is None:
+        password = Path("password.txt").read_text()
+
+    replay = Replay(args.recording, args.speed)
+    asyncio.run(replay.run(args.url, password, args.drain))
+    replay.report()
+
+    result = replay.to_dict()
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        if compare(result, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()